@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+REGRESSION_RATIO = 1.25
+CATEGORY_COUNT = 20
+WORDS = ("note link share image idea todo meeting draft plan review release build fix test design travel recipe book "
+         "music code data sync offline quick tray theme dark light favorite category upload server client cache "
+         "index search report summary project weekly daily budget list shopping health workout garden family").split()
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+def generate_data(count, seed=0):
+    rng = random.Random(seed)
+    categories = [{"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": sentence(rng, 1, 2).title()} for _ in range(CATEGORY_COUNT)]
+    weights = [1.0 / (i + 1) for i in range(CATEGORY_COUNT)]
+    start = datetime(2024, 1, 1)
+    notes = []
+    for i in range(count):
+        if rng.random() < 0.3:
+            category_id = None
+        else:
+            category_id = rng.choices(categories, weights)[0]["id"]
+        images = []
+        if rng.random() < 0.3:
+            images = ["/home/user/Pictures/IMG_%05d.jpg" % rng.randint(0, 99999) for _ in range(rng.randint(1, 5))]
+        body_words = min(2000, int(rng.lognormvariate(4.5, 0.8)))
+        notes.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "title": sentence(rng, 2, 8).capitalize(),
+            "note_text": "\n".join(sentence(rng, 5, 20) for _ in range(max(1, body_words // 12))),
+            "images": images,
+            "link": "https://notetolink.win/n/" + uuid.UUID(int=rng.getrandbits(128)).hex[:10],
+            "timestamp": (start + timedelta(minutes=7 * i)).isoformat(),
+            "category_id": category_id,
+            "favorite": rng.random() < 0.05
+        })
+    return {"categories": categories, "notes": notes}
+
+def measure(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return {"median": statistics.median(times), "min": min(times), "max": max(times), "runs": repeat}
+
+def bench_size(count, repeat, workdir):
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    from core import data
+    from core.repository import repository
+    from ui.pages.my_notes import MyNotesWidget
+    app = QApplication.instance() or QApplication(sys.argv)
+    directory = os.path.join(workdir, str(count))
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    dataset = generate_data(count)
+    data.save_data_sync(dataset)
+    results = {"file_bytes": os.path.getsize(data.LOCAL_CACHE_FILE) + os.path.getsize(data.store.bodies_file())}
+    results["load_data_sync"] = measure(data.load_data_sync, repeat)
+    results["save_data_sync"] = measure(lambda: data.save_data_sync(dataset), repeat)
+    repository.load()
+    page = MyNotesWidget(lambda note: None, lambda note: None, lambda: None)
+    biggest = max(range(page.cat_list.count()), key=lambda row: len(repository.notes_in(page.cat_list.item(row).data(Qt.UserRole))))
+    item = page.cat_list.item(biggest)
+    def switch():
+        page.load_notes_for_category(item)
+        app.processEvents()
+    results["category_switch"] = measure(switch, repeat, lambda: page.load_notes_for_category(page.cat_list.item(0)))
+    rng = random.Random(1)
+    ids = list(repository.notes)
+    def toggle():
+        nid = rng.choice(ids)
+        repository.update_note(nid, favorite=not repository.get(nid).get("favorite", False))
+        data.flush_data_sync()
+    results["favorite_toggle"] = measure(toggle, repeat)
+    titles = [n["title"] for n in dataset["notes"][::max(1, count // 100)]]
+    results["duplicate_title_check"] = measure(lambda: [repository.find_by_title(t) for t in titles], repeat)
+    results["duplicate_title_check"]["per_call"] = results["duplicate_title_check"]["median"] / len(titles)
+    repository.unsubscribe(page.on_repository_changed)
+    page.deleteLater()
+    app.processEvents()
+    return results
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    report = []
+    for size, metrics in results.items():
+        base_metrics = baseline.get("results", {}).get(size, {})
+        for name, value in metrics.items():
+            base = base_metrics.get(name)
+            if not isinstance(value, dict) or not isinstance(base, dict) or not base.get("median"):
+                continue
+            change = value["median"] / base["median"]
+            report.append({"size": size, "metric": name, "baseline": base["median"], "current": value["median"], "ratio": change, "regression": change > ratio})
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the NoteToLink data layer and note list.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results JSON to this file instead of stdout")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="notetolink-bench-")
+    try:
+        results = {str(size): bench_size(size, args.repeat, workdir) for size in args.sizes}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    output = {
+        "meta": {"timestamp": datetime.now().isoformat(), "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat},
+        "results": results
+    }
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            output["comparison"] = compare(results, json.load(f))
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.fail_on_regression and any(r["regression"] for r in output.get("comparison", [])):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import argparse
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_QUEUED = 2
+
+def read_content(args):
+    if args.content is not None:
+        return args.content
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            return f.read()
+    if not sys.stdin.isatty():
+        return sys.stdin.read()
+    return ""
+
+def resolve_category(repo, name):
+    if not name:
+        return None
+    for c in repo.categories():
+        if c["name"].casefold() == name.casefold():
+            return c["id"]
+    raise SystemExit("Unknown category: " + name)
+
+def make_draft(args, repo):
+    content = read_content(args).strip()
+    title = (args.title or "").strip()
+    if not title or not content:
+        raise SystemExit("Title and Content cannot be empty!")
+    if len(args.image) > 5:
+        raise SystemExit("A note can have at most 5 images.")
+    return {"title": title, "content": content, "images": [os.path.abspath(p) for p in args.image], "category_id": resolve_category(repo, args.category)}
+
+def print_note(note, as_json):
+    if as_json:
+        print(json.dumps(note, ensure_ascii=False, default=dict))
+    else:
+        print("\t".join([note["id"], note.get("timestamp", ""), note.get("title", ""), note.get("link") or note.get("status") or ""]))
+
+def cmd_add(args, repo):
+    from core.publisher import draft_note
+    note = draft_note(make_draft(args, repo))
+    note["favorite"] = args.favorite
+    repo.save_note(note)
+    print(note["id"])
+    return EXIT_OK
+
+def share_pending(repo):
+    from core.outbox import Outbox
+    from core.publisher import BatchPublisher, drafts_from_notes
+    outbox = Outbox(repo)
+    pending = outbox.pending()
+    results = BatchPublisher().publish(drafts_from_notes(pending))
+    code = EXIT_OK
+    for note, (_, link, error) in zip(pending, results):
+        if link is not None:
+            outbox.succeeded(note["id"], link)
+            print(note["id"] + "\t" + link)
+        elif error is not None:
+            outbox.failed(note["id"], error.retryable, error.message)
+            print(note["id"] + "\t" + error.title + ": " + error.message, file=sys.stderr)
+            code = EXIT_QUEUED if error.retryable and code != EXIT_ERROR else EXIT_ERROR
+    return code
+
+def cmd_share(args, repo):
+    from core.api import share_note, ShareError
+    from core.outbox import PENDING
+    from core.publisher import draft_note
+    if args.pending:
+        return share_pending(repo)
+    if args.id:
+        note = repo.get(args.id)
+        if note is None:
+            raise SystemExit("Unknown note: " + args.id)
+        draft = {"title": note["title"], "content": note["note_text"], "images": note.get("images", [])}
+    else:
+        draft = make_draft(args, repo)
+    try:
+        link = share_note({"title": draft["title"], "content": draft["content"]}, draft["images"])
+    except ShareError as e:
+        print(e.title + ": " + e.message, file=sys.stderr)
+        if not e.retryable:
+            return EXIT_ERROR
+        if args.id:
+            repo.update_note(args.id, status=PENDING, error=None)
+        else:
+            note = draft_note(draft, status=PENDING)
+            note["favorite"] = args.favorite
+            repo.save_note(note)
+            print(note["id"] + "\t" + PENDING)
+        return EXIT_QUEUED
+    if args.id:
+        repo.update_note(args.id, link=link, status=None, error=None)
+        print(args.id + "\t" + link)
+    else:
+        note = draft_note(draft, link)
+        note["favorite"] = args.favorite
+        repo.save_note(note)
+        print(note["id"] + "\t" + link)
+    return EXIT_OK
+
+def cmd_list(args, repo):
+    from core.repository import FAVORITES
+    if args.status:
+        notes = repo.with_status(args.status)
+    elif args.favorites:
+        notes = repo.notes_in(FAVORITES)
+    elif args.category or args.uncategorized:
+        notes = repo.notes_in(resolve_category(repo, args.category))
+    else:
+        notes = sorted(repo.notes.values(), key=lambda n: n.get("timestamp", ""), reverse=True)
+    for i, note in enumerate(notes):
+        if args.limit and i >= args.limit:
+            break
+        print_note(note, args.json)
+    return EXIT_OK
+
+def cmd_search(args, repo):
+    from core.search import search_index
+    for nid in search_index.search(args.query, args.limit):
+        note = repo.get(nid)
+        if note is not None:
+            print_note(note, args.json)
+    return EXIT_OK
+
+def cmd_export(args, repo):
+    from core.transfer import export_notes
+    for done, total in export_notes(args.path, repo, False if args.ndjson else None):
+        pass
+    print("Exported %d notes to %s" % (total, args.path))
+    return EXIT_OK
+
+def cmd_import(args, repo):
+    from core.transfer import import_notes
+    for stats in import_notes(args.path, repo):
+        pass
+    print("Imported %d notes and %d categories, skipped %d duplicates and %d invalid records" % (stats["added"], stats["categories"], stats["duplicates"], stats["invalid"]))
+    return EXIT_OK
+
+def cmd_gc(args, repo):
+    from core.blobs import blob_store, note_images, referenced_images, BLOB_GRACE
+    notes = note_images(repo.notes.values())
+    moved = blob_store.migrate(notes)
+    repo.save_notes([dict(repo.get(nid), images=new) for nid, (old, new) in moved.items()])
+    removed, freed = blob_store.collect(referenced_images(notes, moved), BLOB_GRACE if args.grace is None else args.grace)
+    print("Moved images of %d notes into the blob store, removed %d unused blobs (%d bytes)" % (len(moved), removed, freed))
+    return EXIT_OK
+
+def add_note_arguments(parser):
+    parser.add_argument("--title")
+    parser.add_argument("--content", help="note text; read from --file or stdin when omitted")
+    parser.add_argument("--file")
+    parser.add_argument("--image", action="append", default=[])
+    parser.add_argument("--category", help="category name")
+    parser.add_argument("--favorite", action="store_true")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="NoteToLink command line, without the desktop UI.")
+    parser.add_argument("--data-dir", help="directory holding notes_data.json (default: current directory)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="save a note locally")
+    add_note_arguments(add)
+    add.set_defaults(run=cmd_add)
+    share = commands.add_parser("share", help="share a new note, an existing note, or every pending note")
+    add_note_arguments(share)
+    share.add_argument("--id", help="share an existing note")
+    share.add_argument("--pending", action="store_true", help="share every note waiting in the outbox")
+    share.set_defaults(run=cmd_share)
+    lst = commands.add_parser("list", help="list notes, newest first")
+    lst.add_argument("--category", help="category name")
+    lst.add_argument("--uncategorized", action="store_true")
+    lst.add_argument("--favorites", action="store_true")
+    lst.add_argument("--status", help="only notes with this status, e.g. pending or failed")
+    lst.add_argument("--limit", type=int, default=0)
+    lst.add_argument("--json", action="store_true")
+    lst.set_defaults(run=cmd_list)
+    search = commands.add_parser("search", help="full-text search")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--json", action="store_true")
+    search.set_defaults(run=cmd_search)
+    export = commands.add_parser("export", help="export notes to NDJSON or a zip bundle with images")
+    export.add_argument("path")
+    export.add_argument("--ndjson", action="store_true", help="write NDJSON even if the path ends in .zip")
+    export.set_defaults(run=cmd_export)
+    imp = commands.add_parser("import", help="import an NDJSON file or zip bundle")
+    imp.add_argument("path")
+    imp.set_defaults(run=cmd_import)
+    gc = commands.add_parser("gc", help="copy note images into the blob store and remove blobs no note uses")
+    gc.add_argument("--grace", type=int, help="keep unused blobs younger than this many seconds (default: 3600)")
+    gc.set_defaults(run=cmd_gc)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.data_dir:
+        for name in ("file", "path"):
+            if getattr(args, name, None):
+                setattr(args, name, os.path.abspath(getattr(args, name)))
+        if getattr(args, "image", None):
+            args.image = [os.path.abspath(p) for p in args.image]
+        os.chdir(args.data_dir)
+    from core.data import flush_data_sync
+    from core.repository import repository
+    repository.load()
+    try:
+        return args.run(args, repository)
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        flush_data_sync()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,106 @@
 import os
-import mimetypes
-from io import BytesIO
-import requests
-
-API_URL = "https://notetolink.win/api/addnote"
-
-def send_note_api(payload, images):
-    files_tuple = []
-    file_objs = []
-    if not images:
-        files_tuple.append(("images", ("dummy.jpg", BytesIO(b""), "image/jpeg")))
-    else:
-        for ip in images:
+import time
+import random
+from core.images import prepare_images, MAX_IMAGE_DIMENSION, IMAGE_FORMAT, IMAGE_QUALITY
+from core.multipart import MultipartStream
+from core.metrics import metrics
+
+API_URL = os.environ.get("NOTETOLINK_API_URL", "https://notetolink.win/api/addnote")
+HEADERS = {"User-Agent": "Mozilla/5.0", "Origin": "https://notetolink.win", "Referer": "https://notetolink.win/"}
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+RETRY_STATUSES = (500, 502, 503, 504)
+POOL_SIZE = 10
+
+class ApiClient:
+    def __init__(self, api_url=API_URL, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_size=POOL_SIZE, max_image_dimension=MAX_IMAGE_DIMENSION, image_format=IMAGE_FORMAT, image_quality=IMAGE_QUALITY):
+        self.api_url = api_url
+        self.max_image_dimension = max_image_dimension
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    def prepare_files(self, images):
+        if not images:
+            return [("images", "dummy.jpg", "image/jpeg", b"")]
+        parts = prepare_images(images, self.max_image_dimension, self.image_format, self.image_quality)
+        return [("images",) + part for part in parts]
+    def post_note(self, payload, images, progress=None):
+        return self.post_files(payload, self.prepare_files(images), progress)
+    def post_files(self, payload, files, progress=None):
+        import requests
+        attempt = 0
+        while True:
+            body = MultipartStream(payload, files, progress)
+            resp = None
+            start = time.perf_counter()
             try:
-                f = open(ip, "rb")
-                file_objs.append(f)
-                mimetype, _ = mimetypes.guess_type(ip)
-                if not mimetype:
-                    mimetype = "application/octet-stream"
-                files_tuple.append(("images", (os.path.basename(ip), f, mimetype)))
-            except Exception as e:
-                raise Exception("Failed to open image: " + ip) from e
-    headers = {"User-Agent": "Mozilla/5.0", "Origin": "https://notetolink.win", "Referer": "https://notetolink.win/"}
+                resp = self.session.post(self.api_url, data=body, headers={"Content-Type": body.content_type}, timeout=self.timeout)
+            except requests.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+            finally:
+                body.close()
+                if metrics.enabled:
+                    metrics.count("api.bytes_sent", body.sent)
+                    metrics.record("api.post", time.perf_counter() - start, bytes=body.sent, status=resp.status_code if resp is not None else None, attempt=attempt)
+            if resp is not None and (resp.status_code not in RETRY_STATUSES or attempt >= self.max_retries):
+                return resp
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+    def close(self):
+        self.session.close()
+
+default_client = None
+
+def get_client():
+    global default_client
+    if default_client is None:
+        default_client = ApiClient()
+    return default_client
+
+def send_note_api(payload, images, client=None, progress=None):
+    return (client or get_client()).post_note(payload, images, progress)
+
+class ShareError(Exception):
+    def __init__(self, title, message, retryable=False):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+        self.retryable = retryable
+
+def share_note(payload, images, client=None, progress=None):
+    return share_request(lambda: send_note_api(payload, images, client, progress))
+
+def share_files(payload, files, client=None, progress=None):
+    return share_request(lambda: (client or get_client()).post_files(payload, files, progress))
+
+def share_request(send):
+    try:
+        resp = send()
+    except Exception as e:
+        import requests
+        raise ShareError("Network Error", str(e), isinstance(e, requests.RequestException)) from e
+    if resp.status_code != 200:
+        raise ShareError("HTTP Error", "Status: " + str(resp.status_code) + "\n" + resp.text, resp.status_code == 429 or resp.status_code >= 500)
     try:
-        resp = requests.post(API_URL, data=payload, files=files_tuple, headers=headers, timeout=15)
-    finally:
-        for f in file_objs:
-            f.close()
-    return resp
+        js = resp.json()
+    except Exception:
+        raise ShareError("Error", "JSON parse error.")
+    if not js.get("success"):
+        raise ShareError("API Error", "Could not share note: " + js.get("error", "Unknown API error"))
+    return js.get("link", "Unknown")
@@ -0,0 +1,110 @@
+import os
+import time
+import shutil
+import threading
+from core.digests import file_digest
+
+BLOB_DIR = "blobs"
+BLOB_GRACE = 3600
+
+def normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+class BlobStore:
+    def __init__(self, directory=BLOB_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.recent = set()
+    def root(self):
+        return normalize(self.directory) + os.sep
+    def is_blob(self, path):
+        return normalize(path).startswith(self.root())
+    def path_for(self, digest, ext):
+        return "/".join((self.directory, digest[:2], digest + ext.lower()))
+    def locate(self, path):
+        if self.is_blob(path):
+            return path
+        return self.path_for(file_digest(path), os.path.splitext(path)[1])
+    def put(self, path):
+        target = self.locate(path)
+        with self.lock:
+            self.recent.add(normalize(target))
+        if target == path:
+            return path
+        digest = os.path.basename(os.path.splitext(target)[0])
+        try:
+            if file_digest(target) == digest:
+                return target
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + "." + str(threading.get_ident()) + ".tmp"
+        remove_quietly(tmp)
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+        return target
+    def adopt(self, images):
+        out = []
+        for path in images:
+            try:
+                out.append(self.put(path))
+            except OSError:
+                out.append(path)
+        return out
+    def migrate(self, images_by_note):
+        moved = {}
+        for nid, images in images_by_note:
+            if not all(self.is_blob(p) for p in images):
+                stored = self.adopt(images)
+                if stored != images:
+                    moved[nid] = (images, stored)
+        return moved
+    def collect(self, referenced, grace=BLOB_GRACE, now=None):
+        now = time.time() if now is None else now
+        keep = {normalize(p) for p in referenced}
+        with self.lock:
+            keep |= self.recent
+        removed = freed = 0
+        if not os.path.isdir(self.directory):
+            return removed, freed
+        for folder, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if normalize(path) in keep or now - max(st.st_mtime, st.st_ctime) < grace:
+                    continue
+                if remove_quietly(path):
+                    removed += 1
+                    freed += st.st_size
+        return removed, freed
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    return True
+
+def note_images(notes):
+    out = []
+    for note in notes:
+        images = note.get("images")
+        if images:
+            out.append((note["id"], list(images)))
+    return out
+
+def referenced_images(images_by_note, moved=None):
+    moved = moved or {}
+    for nid, images in images_by_note:
+        if nid in moved:
+            yield from moved[nid][1]
+        else:
+            yield from images
+
+blob_store = BlobStore()
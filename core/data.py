@@ -1,55 +1,73 @@
-import os
-import json
-from datetime import datetime
-from PyQt5.QtCore import QObject, QThread, pyqtSignal
+import atexit
+from core.store import NoteStore
+from core.metrics import metrics
 
 LOCAL_CACHE_FILE = "notes_data.json"
 
-class DataWorker(QObject):
-    finished = pyqtSignal(dict)
-    error = pyqtSignal(str)
-    def load(self):
-        try:
-            if os.path.exists(LOCAL_CACHE_FILE):
-                with open(LOCAL_CACHE_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            else:
-                data = {"categories": [], "notes": []}
-            self.finished.emit(data)
-        except Exception as e:
-            self.error.emit(str(e))
-    def save(self, data):
-        try:
-            with open(LOCAL_CACHE_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-            self.finished.emit(data)
-        except Exception as e:
-            self.error.emit(str(e))
-
-def run_data_worker(fn, callback, error_callback, *args, **kwargs):
-    thread = QThread()
-    worker = DataWorker()
-    worker.moveToThread(thread)
-    thread.started.connect(lambda: fn(worker, *args, **kwargs))
-    worker.finished.connect(callback)
-    worker.error.connect(error_callback)
-    worker.finished.connect(thread.quit)
-    worker.finished.connect(worker.deleteLater)
-    thread.finished.connect(thread.deleteLater)
-    thread.start()
+store = NoteStore(LOCAL_CACHE_FILE)
+atexit.register(store.flush)
 
+@metrics.timed("store.load")
 def load_data_sync():
-    if os.path.exists(LOCAL_CACHE_FILE):
-        try:
-            with open(LOCAL_CACHE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {"categories": [], "notes": []}
-    return {"categories": [], "notes": []}
+    try:
+        return store.load()
+    except Exception:
+        return {"categories": [], "notes": []}
 
+@metrics.timed("store.save")
 def save_data_sync(data):
     try:
-        with open(LOCAL_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        store.save(data)
+    except Exception as e:
+        raise Exception("Failed to save data: " + str(e))
+
+def save_note_sync(note):
+    try:
+        store.put_note(note)
+    except Exception as e:
+        raise Exception("Failed to save data: " + str(e))
+
+def save_notes_sync(notes):
+    try:
+        for note in notes:
+            store.put_note(note)
+        store.flush()
+    except Exception as e:
+        raise Exception("Failed to save data: " + str(e))
+
+def delete_note_sync(note_id):
+    try:
+        store.remove_note(note_id)
     except Exception as e:
         raise Exception("Failed to save data: " + str(e))
+
+def save_category_sync(category):
+    try:
+        store.put_category(category)
+    except Exception as e:
+        raise Exception("Failed to save data: " + str(e))
+
+def delete_category_sync(category_id):
+    try:
+        store.remove_category(category_id)
+    except Exception as e:
+        raise Exception("Failed to save data: " + str(e))
+
+@metrics.timed("store.flush")
+def flush_data_sync():
+    try:
+        store.flush()
+    except Exception as e:
+        raise Exception("Failed to save data: " + str(e))
+
+def load_body_sync(ref):
+    try:
+        return store.read_body(ref)
+    except Exception as e:
+        raise Exception("Failed to load note: " + str(e))
+
+def poll_changes_sync():
+    try:
+        return store.poll()
+    except Exception as e:
+        raise Exception("Failed to load data: " + str(e))
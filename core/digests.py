@@ -0,0 +1,41 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1024 * 1024
+DIGEST_CACHE_SIZE = 4096
+
+digest_lock = threading.Lock()
+file_digests = OrderedDict()
+
+def text_digest(title, content):
+    return hashlib.sha256((title or "").encode("utf-8") + b"\0" + (content or "").encode("utf-8")).hexdigest()
+
+def file_digest(path):
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with digest_lock:
+        digest = file_digests.get(key)
+        if digest is not None:
+            file_digests.move_to_end(key)
+            return digest
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with digest_lock:
+        file_digests[key] = digest
+        while len(file_digests) > DIGEST_CACHE_SIZE:
+            file_digests.popitem(last=False)
+    return digest
+
+def note_hashes(title, content, images):
+    out = []
+    for path in images:
+        try:
+            out.append(file_digest(path))
+        except OSError:
+            out.append(None)
+    return {"text": text_digest(title, content), "images": out}
@@ -0,0 +1,60 @@
+import os
+import threading
+from collections import OrderedDict
+from core.store import atomic_write, remove_file
+
+class DiskCache:
+    def __init__(self, directory, max_bytes, suffix=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.lock = threading.Lock()
+        self.entries = None
+        self.total = 0
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+    def scan(self):
+        self.entries = OrderedDict()
+        self.total = 0
+        if not os.path.isdir(self.directory):
+            return
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp") or not name.endswith(self.suffix):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, name[:len(name) - len(self.suffix)], st.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total += size
+    def get(self, key):
+        with self.lock:
+            if self.entries is None:
+                self.scan()
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        atomic_write(path, data, path + "." + str(threading.get_ident()) + ".tmp")
+        with self.lock:
+            if self.entries is None:
+                self.scan()
+            self.total += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                old, old_size = self.entries.popitem(last=False)
+                self.total -= old_size
+                remove_file(self.path_for(old))
@@ -0,0 +1,82 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from core.store import atomic_write, remove_file
+
+DRAFT_DIR = "drafts"
+
+def draft_digest(draft):
+    raw = json.dumps([draft.get("title", ""), draft.get("content", ""), draft.get("images", [])], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def is_empty(draft):
+    return not (draft.get("title", "").strip() or draft.get("content", "").strip() or draft.get("images"))
+
+class DraftStore:
+    def __init__(self, directory=DRAFT_DIR):
+        self.directory = directory
+        self.pending = OrderedDict()
+        self.digests = {}
+        self.busy = False
+        self.cond = threading.Condition()
+        self.writer = None
+    def path_for(self, key):
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", key) + ".json")
+    def load(self, key):
+        try:
+            with open(self.path_for(key), "r", encoding="utf-8") as f:
+                draft = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self.cond:
+            self.digests[key] = draft_digest(draft)
+        return draft
+    def save(self, key, draft, baseline=None):
+        with self.cond:
+            self.pending.pop(key, None)
+            self.pending[key] = (draft, baseline)
+            self.cond.notify_all()
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.run_writer, daemon=True)
+                self.writer.start()
+    def discard(self, key):
+        self.save(key, None)
+    def run_writer(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                key, (draft, baseline) = self.pending.popitem(last=False)
+                self.busy = True
+            try:
+                self.write_draft(key, draft, baseline)
+            except OSError:
+                pass
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+    def write_draft(self, key, draft, baseline):
+        digest = draft_digest(draft) if draft is not None else None
+        with self.cond:
+            last = self.digests.get(key)
+        if draft is None or is_empty(draft) or digest == baseline:
+            with self.cond:
+                self.digests.pop(key, None)
+            remove_file(self.path_for(key))
+            return
+        if digest == last:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.path_for(key), json.dumps(dict(draft, key=key, saved_at=datetime.now().isoformat()), ensure_ascii=False).encode("utf-8"))
+        with self.cond:
+            self.digests[key] = digest
+    def flush(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.pending and not self.busy, timeout)
+
+draft_store = DraftStore()
@@ -0,0 +1,100 @@
+import os
+import hashlib
+import mimetypes
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from core.digests import file_digest
+from core.diskcache import DiskCache
+
+MAX_IMAGE_DIMENSION = 1920
+IMAGE_FORMAT = "JPEG"
+IMAGE_QUALITY = 85
+MAX_WORKERS = 5
+UPLOAD_CACHE_DIR = "upload_cache"
+UPLOAD_CACHE_MAX_BYTES = 256 * 1024 * 1024
+ENCODER_VERSION = 2
+
+pil_image = None
+
+def load_pil():
+    global pil_image
+    if pil_image is None:
+        try:
+            from PIL import Image
+            pil_image = Image
+        except ImportError:
+            pil_image = False
+    return pil_image or None
+
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp"}
+FORMAT_MIMETYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+def original_part(path):
+    if not os.path.isfile(path):
+        raise Exception("Failed to open image: " + path)
+    mimetype, _ = mimetypes.guess_type(path)
+    return (os.path.basename(path), mimetype or "application/octet-stream", path)
+
+class EncodedImageCache(DiskCache):
+    def __init__(self, directory=UPLOAD_CACHE_DIR, max_bytes=UPLOAD_CACHE_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+    def key(self, path, max_dimension, fmt, quality):
+        raw = "%s|%d|%s|%d|%d" % (file_digest(path), max_dimension, fmt, quality, ENCODER_VERSION)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+encoded_cache = EncodedImageCache()
+
+def encoded_name(path, fmt):
+    return os.path.splitext(os.path.basename(path))[0] + FORMAT_EXTENSIONS.get(fmt, "")
+
+def cached_encode_image(path, max_dimension=MAX_IMAGE_DIMENSION, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY, cache=None):
+    cache = cache or encoded_cache
+    try:
+        key = cache.key(path, max_dimension, fmt, quality)
+    except OSError:
+        return encode_image(path, max_dimension, fmt, quality)
+    cached = cache.get(key)
+    if cached is not None:
+        return (encoded_name(path, fmt), FORMAT_MIMETYPES.get(fmt, "application/octet-stream"), cached)
+    part = encode_image(path, max_dimension, fmt, quality)
+    if not isinstance(part[2], str):
+        try:
+            cache.put(key, part[2])
+        except OSError:
+            pass
+    return part
+
+def encode_image(path, max_dimension=MAX_IMAGE_DIMENSION, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    part = original_part(path)
+    Image = load_pil()
+    if Image is None or not max_dimension:
+        return part
+    try:
+        with Image.open(path) as img:
+            resized = img.width > max_dimension or img.height > max_dimension
+            if not resized and img.format == fmt:
+                return part
+            from PIL import ImageOps
+            img.draft("RGB", (max_dimension, max_dimension))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_dimension, max_dimension))
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            buf = BytesIO()
+            img.save(buf, fmt, quality=quality)
+    except Exception:
+        return part
+    data = buf.getbuffer()
+    if not resized and len(data) >= os.path.getsize(path):
+        return part
+    return (encoded_name(path, fmt), FORMAT_MIMETYPES.get(fmt, "application/octet-stream"), data)
+
+def prepare_images(paths, max_dimension=MAX_IMAGE_DIMENSION, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    if not paths:
+        return []
+    if load_pil() is None or not max_dimension:
+        return [encode_image(p, max_dimension, fmt, quality) for p in paths]
+    if len(paths) == 1:
+        return [cached_encode_image(paths[0], max_dimension, fmt, quality)]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(paths))) as pool:
+        return list(pool.map(lambda p: cached_encode_image(p, max_dimension, fmt, quality), paths))
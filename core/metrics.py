@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import traceback
+from collections import deque
+
+METRICS_ENV = "NOTETOLINK_METRICS"
+METRICS_LOG = "notetolink_metrics.log"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+RECENT_EVENTS = 200
+STALL_THRESHOLD = 0.25
+HEARTBEAT_INTERVAL = 0.05
+
+class Metrics:
+    def __init__(self, enabled, log_path=METRICS_LOG):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+        self.events = deque(maxlen=RECENT_EVENTS)
+        self.logger = None
+    def log(self, event):
+        with self.lock:
+            if self.logger is None:
+                import logging
+                from logging.handlers import RotatingFileHandler
+                logger = logging.getLogger("notetolink.metrics")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(RotatingFileHandler(self.log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"))
+                self.logger = logger
+        self.logger.info(json.dumps(event, ensure_ascii=False, default=str))
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+    def record(self, name, seconds, **fields):
+        if not self.enabled:
+            return
+        ms = seconds * 1000
+        event = dict(fields, name=name, ms=round(ms, 2), time=round(time.time(), 3))
+        with self.lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = [0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += ms
+            stats[2] = max(stats[2], ms)
+            stats[3] = ms
+            self.events.append(event)
+        self.log(event)
+    def timed(self, name):
+        def wrap(fn):
+            if not self.enabled:
+                return fn
+            @functools.wraps(fn)
+            def timed_fn(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return timed_fn
+        return wrap
+    def snapshot(self):
+        with self.lock:
+            timers = {name: {"count": c, "avg_ms": total / c, "max_ms": peak, "last_ms": last} for name, (c, total, peak, last) in self.timers.items()}
+            return {"counters": dict(self.counters), "timers": timers, "events": list(self.events)}
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.timers.clear()
+            self.events.clear()
+
+class StallDetector:
+    def __init__(self, metrics, threshold=STALL_THRESHOLD, interval=HEARTBEAT_INTERVAL):
+        self.metrics = metrics
+        self.threshold = threshold
+        self.interval = interval
+        self.thread_id = None
+        self.last_beat = time.monotonic()
+        self.stack = None
+        self.stack_beat = None
+        self.watcher = None
+    def start(self):
+        if self.watcher is not None:
+            return
+        self.thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.watcher = threading.Thread(target=self.watch, daemon=True)
+        self.watcher.start()
+    def beat(self):
+        now = time.monotonic()
+        last = self.last_beat
+        self.last_beat = now
+        stall = now - last - self.interval
+        if stall >= self.threshold:
+            self.metrics.count("gui.stalls")
+            self.metrics.record("gui.stall", stall, stack=self.stack if self.stack_beat == last else None)
+    def watch(self):
+        while True:
+            time.sleep(self.threshold / 2)
+            last = self.last_beat
+            if self.stack_beat != last and time.monotonic() - last - self.interval >= self.threshold:
+                frame = sys._current_frames().get(self.thread_id)
+                self.stack = "".join(traceback.format_stack(frame)) if frame is not None else None
+                self.stack_beat = last
+
+metrics = Metrics(bool(os.environ.get(METRICS_ENV)))
+stall_detector = StallDetector(metrics)
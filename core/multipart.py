@@ -0,0 +1,70 @@
+import os
+import mmap
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+def quote(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", " ").replace("\n", " ")
+
+def map_file(path):
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+class MultipartStream:
+    def __init__(self, fields, files, progress=None, boundary=None):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=" + self.boundary
+        self.progress = progress
+        self.parts = []
+        for name, value in fields.items():
+            head = "--%s\r\nContent-Disposition: form-data; name=\"%s\"\r\n\r\n" % (self.boundary, quote(name))
+            self.parts.append(head.encode("utf-8") + str(value).encode("utf-8") + b"\r\n")
+        for name, filename, mimetype, source in files:
+            head = "--%s\r\nContent-Disposition: form-data; name=\"%s\"; filename=\"%s\"\r\nContent-Type: %s\r\n\r\n" % (self.boundary, quote(name), quote(filename), mimetype)
+            self.parts.append(head.encode("utf-8"))
+            self.parts.append(source if isinstance(source, str) else memoryview(source))
+            self.parts.append(b"\r\n")
+        self.parts.append(("--%s--\r\n" % self.boundary).encode("utf-8"))
+        self.length = sum(os.path.getsize(p) if isinstance(p, str) else len(p) for p in self.parts)
+        self.sent = 0
+        self.index = 0
+        self.offset = 0
+        self.current_file = None
+    def __len__(self):
+        return self.length
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length
+        out = []
+        remaining = size
+        while remaining > 0 and self.index < len(self.parts):
+            part = self.parts[self.index]
+            if isinstance(part, str):
+                if self.current_file is None:
+                    self.current_file = map_file(part)
+                part = self.current_file
+            data = part[self.offset:self.offset + remaining]
+            self.offset += len(data)
+            if self.offset >= len(part):
+                self.index += 1
+                self.offset = 0
+                self.current_file = None
+            if data:
+                out.append(data)
+                remaining -= len(data)
+        chunk = out[0] if len(out) == 1 else b"".join(out)
+        self.sent += len(chunk)
+        if chunk and self.progress:
+            self.progress(self.sent, self.length)
+        return chunk
+    def close(self):
+        self.current_file = None
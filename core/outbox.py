@@ -0,0 +1,77 @@
+import time
+import random
+
+PENDING = "pending"
+FAILED = "failed"
+OUTBOX_CONCURRENCY = 2
+RETRY_BASE = 5
+RETRY_MAX = 300
+
+def note_payload(note):
+    return {"title": note["title"], "content": note["note_text"]}
+
+class Outbox:
+    def __init__(self, repo, concurrency=OUTBOX_CONCURRENCY, retry_base=RETRY_BASE, retry_max=RETRY_MAX):
+        self.repo = repo
+        self.concurrency = concurrency
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.in_flight = set()
+        self.attempts = {}
+        self.next_attempt = {}
+    def pending(self):
+        return self.repo.with_status(PENDING)
+    def find_duplicate(self, title, content, images):
+        for n in self.repo.find_by_title(title):
+            if n.get("status") == PENDING and n.get("note_text") == content and list(n.get("images", [])) == list(images):
+                return n
+        return None
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        slots = self.concurrency - len(self.in_flight)
+        out = []
+        for n in self.pending():
+            if slots <= 0:
+                break
+            nid = n["id"]
+            if nid in self.in_flight or self.next_attempt.get(nid, 0) > now:
+                continue
+            out.append(n)
+            slots -= 1
+        return out
+    def next_due_in(self, now=None):
+        now = time.monotonic() if now is None else now
+        waits = [self.next_attempt.get(n["id"], 0) - now for n in self.pending() if n["id"] not in self.in_flight]
+        if not waits:
+            return None
+        return max(0, min(waits))
+    def started(self, note_id):
+        self.in_flight.add(note_id)
+    def succeeded(self, note_id, link):
+        self.in_flight.discard(note_id)
+        self.attempts.pop(note_id, None)
+        self.next_attempt.pop(note_id, None)
+        if self.repo.get(note_id) is None:
+            return None
+        return self.repo.update_note(note_id, link=link, status=None, error=None)
+    def failed(self, note_id, retryable, message=""):
+        self.in_flight.discard(note_id)
+        if self.repo.get(note_id) is None:
+            return
+        if not retryable:
+            self.attempts.pop(note_id, None)
+            self.next_attempt.pop(note_id, None)
+            self.repo.update_note(note_id, status=FAILED, error=message)
+            return
+        attempt = self.attempts.get(note_id, 0)
+        self.attempts[note_id] = attempt + 1
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * (2 ** attempt)))
+        self.next_attempt[note_id] = time.monotonic() + delay
+    def retry_now(self, note_id):
+        self.attempts.pop(note_id, None)
+        self.next_attempt.pop(note_id, None)
+        note = self.repo.get(note_id)
+        if note is not None and note.get("status") == FAILED:
+            self.repo.update_note(note_id, status=PENDING, error=None)
+    def connectivity_restored(self):
+        self.next_attempt.clear()
@@ -0,0 +1,129 @@
+import os
+import time
+import uuid
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.api import ApiClient, share_files, ShareError
+from core.digests import note_hashes
+from core.blobs import blob_store
+from core.outbox import PENDING, FAILED
+
+BATCH_WORKERS = 8
+HOST_CONCURRENCY = 4
+BATCH_ATTEMPTS = 3
+DRAFT_EXTENSIONS = (".txt", ".md")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+MAX_DRAFT_IMAGES = 5
+
+def draft_images(stem, images):
+    matches = [(image_stem != stem, path) for image_stem, path in images if image_stem == stem or (image_stem.startswith(stem + "-") and image_stem[len(stem) + 1:].isdigit())]
+    return [path for _, path in sorted(matches)]
+
+def drafts_from_folder(folder):
+    names = sorted(os.listdir(folder))
+    images = [(os.path.splitext(name)[0], os.path.join(folder, name)) for name in names if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    drafts = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in DRAFT_EXTENSIONS:
+            continue
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        if content:
+            drafts.append({"title": stem, "content": content, "images": draft_images(stem, images)[:MAX_DRAFT_IMAGES]})
+    return drafts
+
+def drafts_from_notes(notes):
+    return [{"title": n["title"], "content": n["note_text"], "images": list(n.get("images", []))[:MAX_DRAFT_IMAGES], "category_id": n.get("category_id")} for n in notes]
+
+def draft_note(draft, link=None, status=None, error=None):
+    images = blob_store.adopt(draft.get("images", []))
+    note = {
+        "id": str(uuid.uuid4()),
+        "title": draft["title"],
+        "note_text": draft["content"],
+        "images": images,
+        "link": link,
+        "timestamp": datetime.now().isoformat(),
+        "category_id": draft.get("category_id"),
+        "favorite": False,
+        "hashes": note_hashes(draft["title"], draft["content"], images)
+    }
+    if status:
+        note["status"] = status
+    if error:
+        note["error"] = error
+    return note
+
+def result_notes(results):
+    notes = []
+    for draft, link, error in results:
+        if link is not None:
+            notes.append(draft_note(draft, link))
+        elif error is not None:
+            notes.append(draft_note(draft, status=PENDING if error.retryable else FAILED, error=None if error.retryable else error.message))
+    return notes
+
+class BatchPublisher:
+    def __init__(self, client=None, workers=BATCH_WORKERS, host_concurrency=HOST_CONCURRENCY, attempts=BATCH_ATTEMPTS):
+        self.client = client
+        self.workers = workers
+        self.host_concurrency = host_concurrency
+        self.attempts = attempts
+        self.lock = threading.Lock()
+        self.host_slots = {}
+    def get_client(self):
+        with self.lock:
+            if self.client is None:
+                self.client = ApiClient(max_retries=0)
+            return self.client
+    def host_slot(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            slot = self.host_slots.get(host)
+            if slot is None:
+                slot = self.host_slots[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return slot
+    def publish_one(self, draft, cancelled):
+        if cancelled():
+            return None, None
+        client = self.get_client()
+        payload = {"title": draft["title"], "content": draft["content"]}
+        try:
+            files = client.prepare_files(draft.get("images", []))
+        except Exception as e:
+            return None, ShareError("Error", str(e))
+        slot = self.host_slot(client.api_url)
+        attempt = 0
+        while True:
+            if cancelled():
+                return None, None
+            with slot:
+                try:
+                    return share_files(payload, files, client), None
+                except ShareError as e:
+                    error = e
+            attempt += 1
+            if not error.retryable or attempt >= self.attempts:
+                return None, error
+            time.sleep(client.backoff(attempt))
+    def publish(self, drafts, progress=None, cancelled=None):
+        cancelled = cancelled or (lambda: False)
+        results = [None] * len(drafts)
+        done = failed = 0
+        if progress:
+            progress(0, len(drafts), 0)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(drafts)))) as pool:
+            futures = {pool.submit(self.publish_one, draft, cancelled): i for i, draft in enumerate(drafts)}
+            for future in as_completed(futures):
+                i = futures[future]
+                link, error = future.result()
+                results[i] = (drafts[i], link, error)
+                done += 1
+                if error is not None:
+                    failed += 1
+                if progress:
+                    progress(done, len(drafts), failed)
+        return results
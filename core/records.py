@@ -0,0 +1,111 @@
+from collections.abc import MutableMapping
+from core.data import load_body_sync
+from core.store import BODY_FIELDS
+
+META_FIELDS = ("id", "title", "timestamp", "category_id", "favorite", "link", "status", "error", "images")
+META_KEYS = frozenset(META_FIELDS)
+SLOT_FIELDS = frozenset(META_FIELDS + BODY_FIELDS)
+MISSING = object()
+
+class NoteRecord(MutableMapping):
+    __slots__ = META_FIELDS + BODY_FIELDS + ("body", "extra")
+    def __init__(self, note):
+        self.body = None
+        self.extra = None
+        for key, value in note.items():
+            if key in SLOT_FIELDS:
+                setattr(self, key, value)
+            elif key == "body":
+                if "note_text" not in note:
+                    self.body = tuple(value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+    def matches(self, note):
+        if self.body is None or "note_text" in note:
+            return self.body is None and "note_text" in note and dict(self) == note
+        if self.body != tuple(note.get("body", ())):
+            return False
+        for key in META_FIELDS:
+            if getattr(self, key, MISSING) != note.get(key, MISSING):
+                return False
+        return {k: v for k, v in note.items() if k not in SLOT_FIELDS and k != "body"} == (self.extra or {})
+    def copy(self):
+        record = NoteRecord.__new__(NoteRecord)
+        for key in self.__slots__:
+            value = getattr(self, key, MISSING)
+            if value is not MISSING:
+                setattr(record, key, value)
+        if self.extra is not None:
+            record.extra = dict(self.extra)
+        return record
+    def load_body(self):
+        body = load_body_sync(self.body)
+        self.body = None
+        for key in BODY_FIELDS:
+            if key in body:
+                setattr(self, key, body[key])
+    def __getitem__(self, key):
+        if key in META_KEYS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if key in BODY_FIELDS:
+            if self.body is not None:
+                body = load_body_sync(self.body)
+                if key in body:
+                    return body[key]
+                raise KeyError(key)
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    def __setitem__(self, key, value):
+        if key in BODY_FIELDS and self.body is not None:
+            self.load_body()
+        if key in SLOT_FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    def __delitem__(self, key):
+        if key in BODY_FIELDS and self.body is not None:
+            self.load_body()
+        if key in SLOT_FIELDS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+    def __iter__(self):
+        for key in META_FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self.body is not None:
+            yield from (key for key in load_body_sync(self.body) if key in BODY_FIELDS)
+        else:
+            for key in BODY_FIELDS:
+                if hasattr(self, key):
+                    yield key
+        if self.extra is not None:
+            yield from self.extra
+    def __len__(self):
+        return sum(1 for _ in self)
+    def get(self, key, default=None):
+        if key in META_KEYS:
+            return getattr(self, key, default)
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    def __repr__(self):
+        return "NoteRecord(" + repr(self.get("id")) + ")"
@@ -0,0 +1,259 @@
+from bisect import bisect_left, insort
+from collections import namedtuple
+from core.records import NoteRecord
+from core.data import load_data_sync, poll_changes_sync, save_note_sync, save_notes_sync, delete_note_sync, save_category_sync, delete_category_sync
+
+Change = namedtuple("Change", ["notes", "removed", "categories", "counts"], defaults=(frozenset(),))
+
+FAVORITES = "favorites"
+
+def normalize_title(title):
+    return " ".join((title or "").split()).casefold()
+
+class NoteView:
+    def __init__(self, repo, seqs):
+        self.repo = repo
+        self.seqs = seqs
+    def __len__(self):
+        return len(self.seqs)
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.seqs)
+        if not 0 <= i < len(self.seqs):
+            raise IndexError(i)
+        return self.repo.notes[self.repo.order[self.seqs[len(self.seqs) - 1 - i]]]
+    def __iter__(self):
+        for seq in reversed(self.seqs):
+            yield self.repo.notes[self.repo.order[seq]]
+
+class NoteRepository:
+    def __init__(self):
+        self.listeners = []
+        self.loaded = False
+        self.mutations = 0
+        self.bodies_generation = 0
+        self.clear()
+    def clear(self):
+        self.notes = {}
+        self.seq = {}
+        self.order = {}
+        self.keys = {}
+        self.next_seq = 0
+        self.by_category = {}
+        self.favorites = []
+        self.by_title = {}
+        self.by_status = {}
+        self.category_map = {}
+        self.touched = set()
+    def load(self, data=None):
+        if data is None:
+            data = load_data_sync()
+        self.clear()
+        for c in data["categories"]:
+            self.category_map[c["id"]] = c
+        for n in data["notes"]:
+            self.index_note(n)
+        self.bodies_generation = data.get("bodies", 0)
+        self.loaded = True
+        self.notify(Change(set(self.notes), set(), True, self.take_touched()))
+    def sync(self):
+        if not self.loaded:
+            return
+        self.apply_poll(*poll_changes_sync())
+    def apply_poll(self, data, entries):
+        if not self.loaded:
+            return
+        if data is not None:
+            self.apply_data(data)
+        elif entries:
+            self.apply_entries(entries)
+    def apply_entries(self, entries):
+        changed, removed, categories = set(), set(), False
+        for entry in entries:
+            op = entry.get("op")
+            if op == "note":
+                self.index_note(entry["note"])
+                changed.add(entry["note"]["id"])
+                removed.discard(entry["note"]["id"])
+            elif op == "note_del":
+                if self.unindex_note(entry["id"]) is not None:
+                    removed.add(entry["id"])
+                    changed.discard(entry["id"])
+            elif op == "category":
+                self.category_map[entry["category"]["id"]] = entry["category"]
+                categories = True
+            elif op == "category_del":
+                changed |= self.drop_category(entry["id"])
+                categories = True
+        self.mutations += 1
+        self.notify(Change(changed, removed, categories, self.take_touched()))
+    def apply_data(self, data):
+        category_map = {c["id"]: c for c in data["categories"]}
+        categories = category_map != self.category_map
+        regenerated = data.get("bodies", 0) != self.bodies_generation
+        changed, removed = set(), set()
+        for n in data["notes"]:
+            current = self.notes.get(n["id"])
+            if current is None or regenerated or not current.matches(n):
+                self.index_note(n)
+                changed.add(n["id"])
+        present = {n["id"] for n in data["notes"]}
+        for nid in [nid for nid in self.notes if nid not in present]:
+            self.unindex_note(nid)
+            removed.add(nid)
+        if categories:
+            self.category_map = category_map
+        self.bodies_generation = data.get("bodies", 0)
+        if changed or removed or categories:
+            self.mutations += 1
+            self.notify(Change(changed, removed, categories, self.take_touched()))
+    def subscribe(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    def notify(self, change):
+        for listener in list(self.listeners):
+            listener(change)
+    def touch(self, key):
+        self.touched.add(key[0])
+        if key[1]:
+            self.touched.add(FAVORITES)
+    def take_touched(self):
+        touched, self.touched = self.touched, set()
+        return touched
+    def index_note(self, note):
+        if type(note) is not NoteRecord:
+            note = NoteRecord(note)
+        nid = note["id"]
+        key = (note.get("category_id"), bool(note.get("favorite", False)), normalize_title(note.get("title", "")), note.get("status"))
+        old = self.keys.get(nid)
+        if old == key:
+            self.notes[nid] = note
+            return
+        seq = self.seq.get(nid)
+        if seq is None:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.seq[nid] = seq
+            self.order[seq] = nid
+        else:
+            self.unindex_keys(nid, seq, old)
+        if old is None or old[:2] != key[:2]:
+            if old is not None:
+                self.touch(old)
+            self.touch(key)
+        self.notes[nid] = note
+        self.keys[nid] = key
+        insort(self.by_category.setdefault(key[0], []), seq)
+        if key[1]:
+            insort(self.favorites, seq)
+        self.by_title.setdefault(key[2], {})[nid] = None
+        if key[3]:
+            self.by_status.setdefault(key[3], {})[nid] = None
+    def unindex_keys(self, nid, seq, key):
+        cid, fav, title, status = key
+        remove_seq(self.by_category.get(cid), seq)
+        if fav:
+            remove_seq(self.favorites, seq)
+        ids = self.by_title.get(title)
+        if ids is not None:
+            ids.pop(nid, None)
+            if not ids:
+                del self.by_title[title]
+        ids = self.by_status.get(status)
+        if ids is not None:
+            ids.pop(nid, None)
+    def unindex_note(self, nid):
+        seq = self.seq.pop(nid, None)
+        if seq is None:
+            return None
+        key = self.keys.pop(nid)
+        self.unindex_keys(nid, seq, key)
+        self.touch(key)
+        del self.order[seq]
+        return self.notes.pop(nid)
+    def get(self, note_id):
+        return self.notes.get(note_id)
+    def get_many(self, note_ids):
+        return [self.notes.get(nid) for nid in note_ids]
+    def find_by_title(self, title):
+        ids = self.by_title.get(normalize_title(title), {})
+        return [self.notes[nid] for nid in ids]
+    def with_status(self, status):
+        return [self.notes[nid] for nid in self.by_status.get(status, {})]
+    def notes_in(self, category_id):
+        if category_id == FAVORITES:
+            return NoteView(self, self.favorites)
+        return NoteView(self, self.by_category.get(category_id, []))
+    def count(self, category_id):
+        if category_id == FAVORITES:
+            return len(self.favorites)
+        return len(self.by_category.get(category_id, ()))
+    def categories(self):
+        return list(self.category_map.values())
+    def category(self, category_id):
+        return self.category_map.get(category_id)
+    def save_note(self, note):
+        save_note_sync(note)
+        self.mutations += 1
+        self.index_note(note)
+        self.notify(Change({note["id"]}, set(), False, self.take_touched()))
+    def save_notes(self, notes):
+        if not notes:
+            return
+        save_notes_sync(notes)
+        self.mutations += 1
+        for note in notes:
+            self.index_note(note)
+        self.notify(Change({n["id"] for n in notes}, set(), False, self.take_touched()))
+    def update_note(self, note_id, **fields):
+        note = self.notes.get(note_id)
+        if note is None:
+            return None
+        save_note_sync(dict(note, **fields))
+        self.mutations += 1
+        note.update(fields)
+        self.index_note(note)
+        self.notify(Change({note_id}, set(), False, self.take_touched()))
+        return note
+    def delete_note(self, note_id):
+        delete_note_sync(note_id)
+        self.mutations += 1
+        if self.unindex_note(note_id) is not None:
+            self.notify(Change(set(), {note_id}, False, self.take_touched()))
+    def save_category(self, category):
+        save_category_sync(category)
+        self.mutations += 1
+        self.category_map[category["id"]] = category
+        self.notify(Change(set(), set(), True, self.take_touched()))
+    def delete_category(self, category_id):
+        delete_category_sync(category_id)
+        self.mutations += 1
+        changed = self.drop_category(category_id)
+        self.notify(Change(changed, set(), True, self.take_touched()))
+    def drop_category(self, category_id):
+        self.category_map.pop(category_id, None)
+        seqs = self.by_category.pop(category_id, [])
+        changed = set()
+        for seq in seqs:
+            nid = self.order[seq]
+            self.notes[nid]["category_id"] = None
+            self.keys[nid] = (None,) + self.keys[nid][1:]
+            changed.add(nid)
+        if seqs:
+            uncategorized = self.by_category.setdefault(None, [])
+            uncategorized.extend(seqs)
+            uncategorized.sort()
+            self.touched.update((category_id, None))
+        return changed
+
+def remove_seq(seqs, seq):
+    if not seqs:
+        return
+    i = bisect_left(seqs, seq)
+    if i < len(seqs) and seqs[i] == seq:
+        del seqs[i]
+
+repository = NoteRepository()
@@ -0,0 +1,164 @@
+import re
+import math
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from core.repository import repository
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+TITLE_WEIGHT = 3
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_TERMS = 32
+MIN_PREFIX_LENGTH = 2
+SEARCH_LIMIT = 200
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").casefold())
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}
+        self.terms = []
+        self.docs = {}
+        self.doc_terms = {}
+        self.repo = None
+        self.stale = True
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.builder = None
+    def attach(self, repo):
+        repo.subscribe(self.on_change)
+        self.repo = repo
+        self.stale = True
+    def on_change(self, change):
+        if self.stale:
+            self.generation += 1
+            return
+        if len(change.notes) == len(self.repo.notes) and change.categories:
+            self.stale = True
+            return
+        for nid in change.removed:
+            self.remove(nid)
+        for nid in change.notes:
+            note = self.repo.get(nid)
+            if note is not None:
+                self.add(note)
+    def rebuild(self, notes):
+        self.postings = {}
+        self.docs = {}
+        self.doc_terms = {}
+        for note in notes:
+            self.add(note, False)
+        self.terms = sorted(self.postings)
+        self.stale = False
+    def ensure_built(self):
+        builder = self.builder
+        if builder is not None:
+            builder.join()
+        with self.lock:
+            if self.stale and self.repo is not None:
+                self.rebuild(list(self.repo.notes.values()))
+    def build_in_background(self):
+        if not self.stale or self.builder is not None or self.repo is None:
+            return
+        notes = list(self.repo.notes.values())
+        generation = self.generation
+        def run():
+            built = SearchIndex()
+            built.rebuild(notes)
+            with self.lock:
+                self.builder = None
+                if self.stale and generation == self.generation:
+                    self.postings = built.postings
+                    self.terms = built.terms
+                    self.docs = built.docs
+                    self.doc_terms = built.doc_terms
+                    self.stale = False
+        self.builder = threading.Thread(target=run, daemon=True)
+        self.builder.start()
+    def weights(self, note):
+        weights = Counter(tokenize(note.get("note_text", "")))
+        for term in tokenize(note.get("title", "")):
+            weights[term] += TITLE_WEIGHT
+        return weights
+    def add(self, note, keep_sorted=True):
+        nid = note["id"]
+        doc = (note.get("title", ""), hash(note.get("note_text", "")))
+        if self.docs.get(nid) == doc:
+            return
+        self.remove(nid)
+        self.docs[nid] = doc
+        weights = self.weights(note)
+        self.doc_terms[nid] = list(weights)
+        all_postings = self.postings
+        for term, weight in weights.items():
+            postings = all_postings.get(term)
+            if postings is None:
+                postings = all_postings[term] = {}
+                if keep_sorted:
+                    insort(self.terms, term)
+            postings[nid] = weight if weight < 2 else 1 + math.log(weight)
+    def remove(self, nid):
+        self.docs.pop(nid, None)
+        for term in self.doc_terms.pop(nid, []):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(nid, None)
+            if not postings:
+                del self.postings[term]
+                i = bisect_left(self.terms, term)
+                if i < len(self.terms) and self.terms[i] == term:
+                    del self.terms[i]
+    def expand(self, token):
+        if len(token) < MIN_PREFIX_LENGTH:
+            return [token] if token in self.postings else []
+        i = bisect_left(self.terms, token)
+        out = []
+        while i < len(self.terms) and len(out) < MAX_PREFIX_TERMS and self.terms[i].startswith(token):
+            out.append(self.terms[i])
+            i += 1
+        return out
+    def match(self, token, terms, candidates=None):
+        total = max(1, len(self.docs))
+        scores = {}
+        for term in terms:
+            postings = self.postings[term]
+            factor = math.log(1 + total / len(postings)) * (1 if term == token else PREFIX_WEIGHT)
+            if candidates is not None and len(candidates) < len(postings):
+                pairs = ((nid, postings[nid]) for nid in candidates if nid in postings)
+            else:
+                pairs = postings.items()
+            for nid, weight in pairs:
+                score = weight * factor
+                if score > scores.get(nid, 0):
+                    scores[nid] = score
+        return scores
+    def search(self, query, limit=SEARCH_LIMIT):
+        self.ensure_built()
+        with self.lock:
+            return self.ranked(query, limit)
+    def ranked(self, query, limit):
+        tokens = []
+        for token in set(tokenize(query)):
+            terms = self.expand(token)
+            if not terms:
+                return []
+            tokens.append((sum(len(self.postings[t]) for t in terms), token, terms))
+        if not tokens:
+            return []
+        tokens.sort()
+        scores = None
+        for _, token, terms in tokens:
+            matches = self.match(token, terms, scores)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {nid: s + matches[nid] for nid, s in scores.items() if nid in matches}
+            if not scores:
+                return []
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+search_index = SearchIndex()
+search_index.attach(repository)
@@ -0,0 +1,102 @@
+import os
+import json
+import gzip
+import importlib
+
+FORMAT_ENV = "NOTETOLINK_STORE_FORMAT"
+DEFAULT_FORMAT = "json"
+LEGACY_FORMAT = "json-indent"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+class FormatError(Exception):
+    pass
+
+def load_optional(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def encode_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def decode_json(raw):
+    return json.loads(raw)
+
+def encode_msgpack(data):
+    return load_optional("msgpack").packb(data, use_bin_type=True)
+
+def decode_msgpack(raw):
+    return load_optional("msgpack").unpackb(raw, raw=False)
+
+def compress_gzip(raw):
+    return gzip.compress(raw, GZIP_LEVEL)
+
+def compress_zstd(raw):
+    return load_optional("zstandard").ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+
+def decompress_zstd(raw):
+    return load_optional("zstandard").ZstdDecompressor().decompress(raw, max_output_size=0)
+
+SERIALIZERS = {"json": (encode_json, decode_json, None), "msgpack": (encode_msgpack, decode_msgpack, "msgpack")}
+COMPRESSORS = {"gzip": (compress_gzip, gzip.decompress, None), "zstd": (compress_zstd, decompress_zstd, "zstandard")}
+
+def available(module):
+    return module is None or load_optional(module) is not None
+
+def parse_format(spec):
+    name, _, compression = spec.partition("+")
+    if name not in SERIALIZERS:
+        raise FormatError("Unknown store format: " + spec)
+    if compression and compression not in COMPRESSORS:
+        raise FormatError("Unknown store compression: " + spec)
+    for module in (SERIALIZERS[name][2], COMPRESSORS[compression][2] if compression else None):
+        if not available(module):
+            raise FormatError("Store format " + spec + " needs the " + module + " package")
+    return name, compression or None
+
+def configured_format():
+    spec = os.environ.get(FORMAT_ENV) or DEFAULT_FORMAT
+    try:
+        parse_format(spec)
+    except FormatError:
+        return DEFAULT_FORMAT
+    return spec
+
+def dumps(data, spec=DEFAULT_FORMAT):
+    name, compression = parse_format(spec)
+    raw = SERIALIZERS[name][0](data)
+    if compression:
+        raw = COMPRESSORS[compression][0](raw)
+    return raw
+
+def detect(raw):
+    compression = None
+    if raw.startswith(GZIP_MAGIC):
+        compression = "gzip"
+    elif raw.startswith(ZSTD_MAGIC):
+        compression = "zstd"
+    if compression:
+        if not available(COMPRESSORS[compression][2]):
+            raise FormatError("Store is " + compression + " compressed but the " + COMPRESSORS[compression][2] + " package is missing")
+        raw = COMPRESSORS[compression][1](raw)
+    first = raw.lstrip()[:1]
+    if first in (b"{", b"["):
+        name = "json"
+    elif first and (0x80 <= first[0] <= 0x8f or first[0] in (0xde, 0xdf)):
+        if not available("msgpack"):
+            raise FormatError("Store is msgpack encoded but the msgpack package is missing")
+        name = "msgpack"
+    else:
+        raise ValueError("Unrecognized store format")
+    return (name + "+" + compression if compression else name), raw
+
+def loads(raw):
+    spec, raw = detect(raw)
+    data = SERIALIZERS[spec.partition("+")[0]][1](raw)
+    if spec == "json" and raw[:2] in (b"{\n", b"{\r"):
+        spec = LEGACY_FORMAT
+    return data, spec
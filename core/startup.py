@@ -0,0 +1,24 @@
+import os
+import sys
+import json
+import time
+
+STARTUP_REPORT_ENV = "NOTETOLINK_STARTUP_REPORT"
+
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+        self.reported = False
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - self.start) * 1000
+    def report(self):
+        return {name: round(ms, 1) for name, ms in self.marks.items()}
+    def emit(self, stream=None):
+        if self.reported or not os.environ.get(STARTUP_REPORT_ENV):
+            return
+        self.reported = True
+        print(json.dumps({"startup_ms": self.report()}), file=stream or sys.stderr)
+
+startup_timer = StartupTimer()
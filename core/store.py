@@ -0,0 +1,464 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from core.serialization import dumps, loads, configured_format, FormatError
+
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+BODIES_SUFFIX = ".bodies."
+COMPACT_THRESHOLD = 1000
+WRITE_DELAY = 0.5
+BODY_FIELDS = ("note_text", "hashes")
+BODY_CACHE_BYTES = 16 * 1024 * 1024
+BODY_GC_MIN_BYTES = 1024 * 1024
+
+def empty_data():
+    return {"categories": [], "notes": []}
+
+def fsync_dir(path):
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def entry_key(entry):
+    op = entry.get("op")
+    if op == "note":
+        return ("note", entry["note"]["id"])
+    if op == "category":
+        return ("category", entry["category"]["id"])
+    return ("note" if op == "note_del" else "category", entry.get("id"))
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.depth = 0
+    def acquire(self):
+        if self.depth == 0:
+            f = open(self.path, "a+b")
+            try:
+                if os.name == "nt":
+                    import msvcrt
+                    f.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            pass
+                else:
+                    import fcntl
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                f.close()
+                raise
+            self.file = f
+        self.depth += 1
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            f, self.file = self.file, None
+            try:
+                if os.name == "nt":
+                    import msvcrt
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            finally:
+                f.close()
+    def __enter__(self):
+        self.acquire()
+        return self
+    def __exit__(self, *exc):
+        self.release()
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def atomic_write(path, raw, tmp=None):
+    tmp = tmp or path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(path)
+
+def dumps_entry(entry):
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=dict) + "\n"
+
+def dumps_body(note):
+    return json.dumps({k: note[k] for k in BODY_FIELDS if k in note}, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def has_body_ref(note):
+    return "body" in note and "note_text" not in note
+
+def apply_entry(data, entry, note_index=None):
+    op = entry.get("op")
+    if note_index is None:
+        note_index = {n["id"]: i for i, n in enumerate(data["notes"])}
+    if op == "note":
+        note = entry["note"]
+        i = note_index.get(note["id"])
+        if i is None:
+            note_index[note["id"]] = len(data["notes"])
+            data["notes"].append(note)
+        else:
+            data["notes"][i] = note
+    elif op == "note_del":
+        i = note_index.pop(entry["id"], None)
+        if i is not None:
+            data["notes"][i] = None
+    elif op == "category":
+        cat = entry["category"]
+        for i, c in enumerate(data["categories"]):
+            if c["id"] == cat["id"]:
+                data["categories"][i] = cat
+                break
+        else:
+            data["categories"].append(cat)
+    elif op == "category_del":
+        cid = entry["id"]
+        data["categories"] = [c for c in data["categories"] if c["id"] != cid]
+        for n in data["notes"]:
+            if n is not None and n.get("category_id") == cid:
+                n["category_id"] = None
+
+class NoteStore:
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD, write_delay=WRITE_DELAY, format=None):
+        self.path = path
+        self.format = format or configured_format()
+        self.snapshot_format = None
+        self.snapshot_legacy = False
+        self.bodies_generation = 0
+        self.reader_generation = 0
+        self.body_cache = OrderedDict()
+        self.body_cache_bytes = 0
+        self.body_reader = None
+        self.body_lock = threading.Lock()
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.write_delay = write_delay
+        self.journal_entries = 0
+        self.snapshot_entries = 0
+        self.snapshot_stamp = None
+        self.journal_offset = 0
+        self.external = []
+        self.reset = False
+        self.file_lock = FileLock(path + LOCK_SUFFIX)
+        self.pending = OrderedDict()
+        self.deadline = None
+        self.error = None
+        self.io_lock = threading.RLock()
+        self.cond = threading.Condition()
+        self.writer = None
+    @contextmanager
+    def locked(self):
+        with self.io_lock, self.file_lock:
+            yield
+    def load(self):
+        with self.locked():
+            self.flush()
+            data = self.read_snapshot()
+            stale = self.snapshot_legacy or self.snapshot_format not in (None, self.format) or not all(has_body_ref(n) for n in data["notes"])
+            self.snapshot_entries = len(data["notes"]) + len(data["categories"])
+            self.journal_entries = self.replay(data)
+            wasted = self.bodies_wasted(data)
+            if wasted:
+                data = self.rewrite_bodies(data)
+            if stale or wasted or self.compact_due():
+                data = self.save(data)
+            if wasted:
+                remove_file(self.bodies_file(self.bodies_generation - 2))
+            self.use_generation(self.bodies_generation)
+            self.external = []
+            self.reset = False
+            return data
+    def use_generation(self, generation):
+        if generation != self.reader_generation:
+            self.close_bodies()
+            self.reader_generation = generation
+    def changed(self):
+        if self.reset or self.external or file_stamp(self.path) != self.snapshot_stamp:
+            return True
+        stamp = file_stamp(self.journal_path)
+        return (stamp[1] if stamp else 0) != self.journal_offset
+    def check_snapshot(self):
+        if file_stamp(self.path) != self.snapshot_stamp:
+            self.reset = True
+    def poll(self):
+        with self.locked():
+            self.flush()
+            self.check_snapshot()
+            stamp = file_stamp(self.journal_path)
+            if self.reset or (stamp[1] if stamp else 0) < self.journal_offset:
+                data = self.read_snapshot()
+                self.snapshot_entries = len(data["notes"]) + len(data["categories"])
+                self.journal_entries = self.replay(data)
+                self.use_generation(self.bodies_generation)
+                self.external = []
+                self.reset = False
+                return data, []
+            entries, self.journal_offset = self.read_entries(self.journal_offset)
+            self.journal_entries += len(entries)
+            entries, self.external = self.external + entries, []
+            return None, entries
+    def compact_due(self):
+        return self.journal_entries >= max(self.compact_threshold, self.snapshot_entries // 2)
+    def read_snapshot(self):
+        self.snapshot_format = None
+        self.snapshot_legacy = False
+        self.bodies_generation = 0
+        self.snapshot_stamp = file_stamp(self.path)
+        if not os.path.exists(self.path):
+            return empty_data()
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            if not raw.strip():
+                return empty_data()
+            data, self.snapshot_format = loads(raw)
+        except FormatError:
+            raise
+        except Exception:
+            return empty_data()
+        data.setdefault("categories", [])
+        data.setdefault("notes", [])
+        self.bodies_generation = data.get("bodies", 0)
+        self.snapshot_legacy = self.lift_images(data)
+        return data
+    def lift_images(self, data):
+        legacy = [n for n in data["notes"] if has_body_ref(n) and "images" not in n]
+        if not legacy:
+            return False
+        with open(self.bodies_file(), "rb") as f:
+            for n in legacy:
+                offset, length = n["body"]
+                f.seek(offset)
+                n["images"] = json.loads(f.read(length)).get("images", [])
+        return True
+    def replay(self, data):
+        entries, self.journal_offset = self.read_entries(0)
+        note_index = {n["id"]: i for i, n in enumerate(data["notes"])}
+        for entry in entries:
+            apply_entry(data, entry, note_index)
+        data["notes"] = [n for n in data["notes"] if n is not None]
+        return len(entries)
+    def read_entries(self, offset):
+        entries = []
+        if not os.path.exists(self.journal_path):
+            return entries, 0
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries, offset
+    def save(self, data):
+        with self.locked():
+            data = dict(data, notes=self.spill_bodies(data["notes"]), bodies=self.bodies_generation)
+            atomic_write(self.path, dumps(data, self.format))
+            self.snapshot_format = self.format
+            self.snapshot_legacy = False
+            self.snapshot_stamp = file_stamp(self.path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.journal_offset = 0
+            self.journal_entries = 0
+            self.snapshot_entries = len(data["notes"]) + len(data["categories"])
+            return data
+    def bodies_file(self, generation=None):
+        return self.path + BODIES_SUFFIX + str(self.bodies_generation if generation is None else generation)
+    def spill_bodies(self, notes):
+        if all(has_body_ref(n) for n in notes):
+            return notes
+        self.bodies_generation = self.bodies_generation or 1
+        out = []
+        with open(self.bodies_file(), "ab") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            for n in notes:
+                if not has_body_ref(n):
+                    raw = dumps_body(n)
+                    f.write(raw)
+                    n = {k: v for k, v in n.items() if k not in BODY_FIELDS}
+                    n["body"] = [offset, len(raw)]
+                    offset += len(raw)
+                out.append(n)
+            f.flush()
+            os.fsync(f.fileno())
+        return out
+    def bodies_wasted(self, data):
+        try:
+            size = os.path.getsize(self.bodies_file())
+        except OSError:
+            return False
+        live = sum(n["body"][1] for n in data["notes"] if has_body_ref(n))
+        return size >= BODY_GC_MIN_BYTES and size > 2 * live
+    def rewrite_bodies(self, data):
+        self.close_bodies()
+        notes = []
+        with open(self.bodies_file(), "rb") as src, open(self.bodies_file(self.bodies_generation + 1), "wb") as dst:
+            for n in data["notes"]:
+                if has_body_ref(n):
+                    offset, length = n["body"]
+                    src.seek(offset)
+                    n = dict(n, body=[dst.tell(), length])
+                    dst.write(src.read(length))
+                notes.append(n)
+            dst.flush()
+            os.fsync(dst.fileno())
+        self.bodies_generation += 1
+        return dict(data, notes=notes)
+    def close_bodies(self):
+        with self.body_lock:
+            if self.body_reader is not None:
+                self.body_reader.close()
+                self.body_reader = None
+            self.body_cache.clear()
+            self.body_cache_bytes = 0
+    def read_body(self, ref):
+        offset, length = ref
+        with self.body_lock:
+            cached = self.body_cache.get(offset)
+            if cached is not None:
+                self.body_cache.move_to_end(offset)
+                return cached[0]
+            if self.body_reader is None:
+                self.body_reader = open(self.bodies_file(self.reader_generation), "rb", buffering=0)
+            self.body_reader.seek(offset)
+            raw = self.body_reader.read(length)
+            if len(raw) != length:
+                raise ValueError("Note body at " + str(offset) + " is truncated")
+            body = json.loads(raw)
+            self.body_cache[offset] = (body, length)
+            self.body_cache_bytes += length
+            while self.body_cache_bytes > BODY_CACHE_BYTES and len(self.body_cache) > 1:
+                _, (_, size) = self.body_cache.popitem(last=False)
+                self.body_cache_bytes -= size
+            return body
+    def write_journal(self, lines, keys=()):
+        self.check_snapshot()
+        if not self.reset:
+            entries, self.journal_offset = self.read_entries(self.journal_offset)
+            self.journal_entries += len(entries)
+            self.external.extend(entries)
+        if keys and self.external:
+            keys = set(keys)
+            self.external = [e for e in self.external if entry_key(e) not in keys]
+        with open(self.journal_path, "a+b") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write("".join(lines).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            self.journal_offset = f.tell()
+        self.journal_entries += len(lines)
+        if self.compact_due():
+            self.compact()
+    def compact(self):
+        with self.locked():
+            self.save(self.load_uncompacted())
+    def load_uncompacted(self):
+        data = self.read_snapshot()
+        self.replay(data)
+        return data
+    def merge(self, key, line, keep_position):
+        if key in self.pending and not keep_position:
+            del self.pending[key]
+        self.pending[key] = (line, keep_position)
+    def enqueue(self, key, entry, keep_position):
+        line = dumps_entry(entry)
+        with self.cond:
+            error, self.error = self.error, None
+            self.merge(key, line, keep_position)
+            if self.deadline is None:
+                self.deadline = time.monotonic() + (self.write_delay or 0)
+            self.cond.notify()
+        if error is not None:
+            raise error
+        if not self.write_delay:
+            self.flush()
+        elif self.writer is None:
+            self.writer = threading.Thread(target=self.run_writer, daemon=True)
+            self.writer.start()
+    def take_pending(self):
+        with self.cond:
+            items = list(self.pending.items())
+            self.pending.clear()
+            self.deadline = None
+            return items
+    def restore_pending(self, items):
+        with self.cond:
+            newer = self.pending
+            self.pending = OrderedDict(items)
+            for key, (line, keep_position) in newer.items():
+                self.merge(key, line, keep_position)
+            self.deadline = time.monotonic() + (self.write_delay or 0)
+    def flush(self):
+        if not self.has_pending():
+            return
+        with self.locked():
+            items = self.take_pending()
+            if not items:
+                return
+            try:
+                self.write_journal([line for _, (line, _) in items], [key for key, _ in items])
+            except Exception:
+                self.restore_pending(items)
+                raise
+    def has_pending(self):
+        with self.cond:
+            return bool(self.pending)
+    def run_writer(self):
+        while True:
+            with self.cond:
+                while self.deadline is None:
+                    self.cond.wait()
+                remaining = self.deadline - time.monotonic()
+                if remaining > 0:
+                    self.cond.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except Exception as e:
+                with self.cond:
+                    self.error = e
+    def put_note(self, note):
+        self.enqueue(("note", note["id"]), {"op": "note", "note": note}, True)
+    def remove_note(self, note_id):
+        self.enqueue(("note", note_id), {"op": "note_del", "id": note_id}, False)
+    def put_category(self, category):
+        self.enqueue(("category", category["id"]), {"op": "category", "category": category}, True)
+    def remove_category(self, category_id):
+        self.enqueue(("category", category_id), {"op": "category_del", "id": category_id}, False)
@@ -0,0 +1,221 @@
+import os
+import json
+import uuid
+import shutil
+import zipfile
+import tempfile
+from datetime import datetime
+from core.digests import file_digest
+from core.blobs import blob_store
+from core.repository import normalize_title
+
+FORMAT_NAME = "notetolink"
+FORMAT_VERSION = 1
+BUNDLE_NOTES = "notes.ndjson"
+BUNDLE_IMAGES = "images/"
+IMPORT_IMAGE_DIR = "imported_images"
+IMPORT_BATCH_SIZE = 500
+PROGRESS_EVERY = 200
+
+class TransferError(Exception):
+    pass
+
+def dumps_record(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=dict) + "\n"
+
+def write_records(f, repo, note_ids, add_image=None):
+    total = len(note_ids)
+    f.write(dumps_record({"format": FORMAT_NAME, "version": FORMAT_VERSION}).encode("utf-8"))
+    for c in repo.categories():
+        f.write(dumps_record({"category": c}).encode("utf-8"))
+    for start in range(0, total, PROGRESS_EVERY):
+        yield start, total
+        for note in repo.get_many(note_ids[start:start + PROGRESS_EVERY]):
+            if note is None:
+                continue
+            if add_image is not None and note.get("images"):
+                note = dict(note, images=[add_image(p) for p in note["images"]])
+            f.write(dumps_record({"note": note}).encode("utf-8"))
+    yield total, total
+
+def export_notes(path, repo, bundle=None):
+    if bundle is None:
+        bundle = path.lower().endswith(".zip")
+    note_ids = list(repo.notes)
+    tmp = path + ".tmp"
+    try:
+        if bundle:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf, tempfile.TemporaryFile() as lines:
+                written = {}
+                def add_image(image):
+                    try:
+                        digest = file_digest(image)
+                    except OSError:
+                        return image
+                    name = written.get(digest)
+                    if name is None:
+                        name = BUNDLE_IMAGES + digest + os.path.splitext(image)[1].lower()
+                        zf.write(image, name, zipfile.ZIP_STORED)
+                        written[digest] = name
+                    return name
+                yield from write_records(lines, repo, note_ids, add_image)
+                lines.seek(0)
+                with zf.open(BUNDLE_NOTES, "w", force_zip64=True) as out:
+                    shutil.copyfileobj(lines, out)
+        else:
+            with open(tmp, "wb") as f:
+                yield from write_records(f, repo, note_ids)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def clean_category(raw):
+    if not isinstance(raw, dict) or not isinstance(raw.get("id"), str) or not isinstance(raw.get("name"), str) or not raw["name"].strip():
+        return None
+    return {"id": raw["id"], "name": raw["name"].strip()}
+
+def clean_note(raw, category_map):
+    if not isinstance(raw, dict):
+        return None
+    title = raw.get("title")
+    text = raw.get("note_text")
+    images = raw.get("images") or []
+    if not isinstance(title, str) or not title.strip() or not isinstance(text, str):
+        return None
+    if not isinstance(images, list) or not all(isinstance(i, str) for i in images):
+        return None
+    nid = raw.get("id")
+    timestamp = raw.get("timestamp")
+    link = raw.get("link")
+    note = {
+        "id": nid if isinstance(nid, str) and nid else str(uuid.uuid4()),
+        "title": title,
+        "note_text": text,
+        "images": images,
+        "link": link if isinstance(link, str) else None,
+        "timestamp": timestamp if isinstance(timestamp, str) else datetime.now().isoformat(),
+        "category_id": category_map.get(raw.get("category_id")),
+        "favorite": bool(raw.get("favorite", False))
+    }
+    if isinstance(raw.get("hashes"), dict):
+        note["hashes"] = raw["hashes"]
+    return note
+
+def read_lines(f, total):
+    done = 0
+    for raw in f:
+        done += len(raw)
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line.decode("utf-8"))
+        except ValueError:
+            record = None
+        yield record, done, total
+
+def extract_image(zf, name, image_dir):
+    target = os.path.join(image_dir, os.path.basename(name))
+    if not os.path.exists(target):
+        os.makedirs(image_dir, exist_ok=True)
+        tmp = target + ".tmp"
+        with zf.open(name) as src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, target)
+    return os.path.abspath(target)
+
+def open_source(path, image_dir=IMPORT_IMAGE_DIR):
+    if not zipfile.is_zipfile(path):
+        return open(path, "rb"), os.path.getsize(path), None, None
+    zf = zipfile.ZipFile(path)
+    try:
+        info = zf.getinfo(BUNDLE_NOTES)
+    except KeyError:
+        zf.close()
+        raise TransferError("Not a NoteToLink bundle: " + path)
+    members = set(zf.namelist())
+    def resolve(image):
+        if image.startswith(BUNDLE_IMAGES) and image in members:
+            return extract_image(zf, image, image_dir)
+        return image
+    return zf.open(info), info.file_size, resolve, zf
+
+def check_header(record):
+    if record["format"] != FORMAT_NAME or not isinstance(record.get("version"), int) or record["version"] > FORMAT_VERSION:
+        raise TransferError("Unsupported export format: " + str(record["format"]) + " " + str(record.get("version")))
+
+def read_notes(path, image_dir=IMPORT_IMAGE_DIR):
+    f, total, resolve, zf = open_source(path, image_dir)
+    try:
+        for record, _, _ in read_lines(f, total):
+            if isinstance(record, dict) and "format" in record:
+                check_header(record)
+                continue
+            note = clean_note(record.get("note") if isinstance(record, dict) else None, {})
+            if note is None:
+                continue
+            if resolve is not None and note["images"]:
+                note["images"] = [resolve(image) for image in note["images"]]
+            yield note
+    finally:
+        f.close()
+        if zf is not None:
+            zf.close()
+
+def import_notes(path, repo, image_dir=IMPORT_IMAGE_DIR, batch_size=IMPORT_BATCH_SIZE):
+    stats = {"added": 0, "duplicates": 0, "invalid": 0, "categories": 0, "done": 0, "total": 0}
+    f, total, resolve, zf = open_source(path, image_dir)
+    categories = repo.categories()
+    category_map = {c["id"]: c["id"] for c in categories}
+    category_names = {c["name"].casefold(): c["id"] for c in categories}
+    known_ids = set(repo.notes)
+    seen_ids = set()
+    seen_notes = set()
+    batch = []
+    try:
+        for record, done, total in read_lines(f, total):
+            stats["done"] = done
+            stats["total"] = total
+            if isinstance(record, dict) and "format" in record:
+                check_header(record)
+                continue
+            if isinstance(record, dict) and "category" in record:
+                category = clean_category(record["category"])
+                if category is None:
+                    stats["invalid"] += 1
+                elif category["id"] not in category_map:
+                    existing = category_names.get(category["name"].casefold())
+                    if existing is None:
+                        repo.save_category(category)
+                        category_names[category["name"].casefold()] = category["id"]
+                        stats["categories"] += 1
+                        existing = category["id"]
+                    category_map[category["id"]] = existing
+                continue
+            note = clean_note(record.get("note") if isinstance(record, dict) else None, category_map)
+            if note is None:
+                stats["invalid"] += 1
+                continue
+            key = (normalize_title(note["title"]), hash(note["note_text"]))
+            if note["id"] in seen_ids or note["id"] in known_ids or key in seen_notes or any(n.get("note_text") == note["note_text"] for n in repo.find_by_title(note["title"])):
+                stats["duplicates"] += 1
+                continue
+            seen_ids.add(note["id"])
+            seen_notes.add(key)
+            if resolve is not None and note["images"]:
+                note["images"] = [resolve(image) for image in note["images"]]
+            note["images"] = blob_store.adopt(note["images"])
+            batch.append(note)
+            if len(batch) >= batch_size:
+                repo.save_notes(batch)
+                stats["added"] += len(batch)
+                batch = []
+                yield stats
+        repo.save_notes(batch)
+        stats["added"] += len(batch)
+        yield stats
+    finally:
+        f.close()
+        if zf is not None:
+            zf.close()
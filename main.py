@@ -1,12 +1,23 @@
 import sys
+import time
+from core.startup import startup_timer
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction
+from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QIcon
-from ui.mainwindow import MainWindow
-from ui.pages.quick_note import QuickNoteDialog
+from core.data import flush_data_sync
+from core.repository import repository
+from core.metrics import metrics, stall_detector
+from ui.workers import get_outbox_sync, get_store_watcher, get_blob_maintenance, flush_drafts, BLOB_MAINTENANCE_DELAY
 
 def main():
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("icon.ico"))
+    startup_timer.mark("app")
+    if metrics.enabled:
+        heartbeat = QTimer(app)
+        heartbeat.timeout.connect(stall_detector.beat)
+        heartbeat.start(int(stall_detector.interval * 1000))
+        stall_detector.start()
     tray_icon = QSystemTrayIcon(QIcon("icon.ico"), app)
     tray_menu = QMenu()
     show_action = QAction("Show", tray_icon)
@@ -16,13 +27,44 @@ def main():
     tray_menu.addAction(quick_action)
     tray_menu.addAction(exit_action)
     tray_icon.setContextMenu(tray_menu)
+    tray_icon.show()
+    app.tray_icon = tray_icon
+    startup_timer.mark("tray")
+    from ui.mainwindow import MainWindow
     main_window = MainWindow()
+    quick_note = None
+    def quick_note_dialog():
+        nonlocal quick_note
+        if quick_note is None:
+            from ui.pages.quick_note import QuickNoteDialog
+            quick_note = QuickNoteDialog(main_window.on_notes_updated)
+            quick_note.prewarm()
+        return quick_note
+    def open_quick_note():
+        clicked_at = time.perf_counter()
+        quick_note_dialog().open_note(clicked_at)
     show_action.triggered.connect(lambda: main_window.show_main_window())
-    quick_action.triggered.connect(lambda: QuickNoteDialog(main_window.on_notes_updated).exec_())
+    quick_action.triggered.connect(open_quick_note)
     exit_action.triggered.connect(app.quit)
-    tray_icon.show()
-    app.tray_icon = tray_icon
+    app.aboutToQuit.connect(flush_drafts)
+    app.aboutToQuit.connect(flush_data_sync)
+    outbox_sync = get_outbox_sync()
+    def on_outbox_shared(nid, link):
+        note = repository.get(nid)
+        if note is None:
+            return
+        tray_icon.showMessage("Note Shared", f"Pending note '{note['title']}' has been shared.\nLink: {link}", QSystemTrayIcon.Information, 5000)
+    outbox_sync.shared.connect(on_outbox_shared)
+    def on_data_loaded():
+        startup_timer.mark("data_loaded")
+        outbox_sync.start()
+        get_store_watcher().start()
+        QTimer.singleShot(0, quick_note_dialog)
+        QTimer.singleShot(BLOB_MAINTENANCE_DELAY, get_blob_maintenance().start)
+        startup_timer.emit()
     main_window.show()
+    startup_timer.mark("window_shown")
+    main_window.load_data(on_data_loaded)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
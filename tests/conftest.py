@@ -0,0 +1,8 @@
+import pytest
+from core.data import store
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(store, "write_delay", 0)
+    return tmp_path
@@ -0,0 +1,26 @@
+import os
+from core.diskcache import DiskCache
+
+def test_put_get_and_lru_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"), 10, ".bin")
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert sorted(os.listdir(tmp_path / "cache")) == ["a.bin", "c.bin"]
+    assert cache.total == 8
+
+def test_scan_restores_entries_in_mtime_order(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    for i, key in enumerate(["new", "old"]):
+        path = directory / (key + ".bin")
+        path.write_bytes(b"xxxx")
+        os.utime(path, (1000 - i * 100, 1000 - i * 100))
+    (directory / "stray.bin.1.tmp").write_bytes(b"partial")
+    cache = DiskCache(str(directory), 10, ".bin")
+    cache.put("next", b"yyyy")
+    assert cache.get("old") is None
+    assert cache.get("new") == b"xxxx"
+    assert cache.get("stray") is None
@@ -0,0 +1,34 @@
+from core.multipart import MultipartStream
+
+def make_stream(tmp_path, progress=None):
+    image = tmp_path / "photo.jpg"
+    image.write_bytes(b"\xff\xd8" + bytes(range(256)) * 600)
+    empty = tmp_path / "empty.png"
+    empty.write_bytes(b"")
+    files = [("images", "photo.jpg", "image/jpeg", str(image)), ("images", "small.png", "image/png", b"PNGDATA"), ("images", "empty.png", "image/png", str(empty))]
+    return MultipartStream({"title": "Hi \"there\"", "content": "line\nbreak"}, files, progress, boundary="b0undary"), image
+
+def test_length_matches_body(tmp_path):
+    stream, image = make_stream(tmp_path)
+    body = b"".join(stream)
+    assert len(stream) == len(body)
+    assert body.startswith(b'--b0undary\r\nContent-Disposition: form-data; name="title"\r\n\r\nHi "there"\r\n')
+    assert b'filename="photo.jpg"\r\nContent-Type: image/jpeg\r\n\r\n' + image.read_bytes() + b"\r\n" in body
+    assert b"\r\n\r\nPNGDATA\r\n" in body
+    assert b'filename="empty.png"\r\nContent-Type: image/png\r\n\r\n\r\n' in body
+    assert body.endswith(b"--b0undary--\r\n")
+
+def test_small_reads_and_progress(tmp_path):
+    sent = []
+    stream, _ = make_stream(tmp_path, lambda done, total: sent.append((done, total)))
+    whole = b"".join(make_stream(tmp_path)[0])
+    chunks = []
+    while True:
+        chunk = stream.read(1000)
+        if not chunk:
+            break
+        assert len(chunk) <= 1000
+        chunks.append(bytes(chunk))
+    assert b"".join(chunks) == whole
+    assert sent[-1] == (len(whole), len(whole))
+    assert [done for done, _ in sent] == sorted(done for done, _ in sent)
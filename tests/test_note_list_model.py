@@ -0,0 +1,65 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import pytest
+from PyQt5.QtWidgets import QApplication
+from core.repository import NoteRepository
+from core.store import empty_data
+from ui.widgets import NoteListModel, FETCH_BATCH_SIZE
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+def make_note(nid, category_id=None, title=None):
+    return {"id": nid, "title": title or nid, "note_text": "", "images": [], "category_id": category_id, "favorite": False, "timestamp": "2026-01-01T00:00:00"}
+
+def make_model(count):
+    repo = NoteRepository()
+    repo.load(empty_data())
+    repo.save_notes([make_note("n%d" % i) for i in range(count)])
+    model = NoteListModel()
+    model.set_notes(repo.notes_in(None))
+    events = []
+    model.rowsInserted.connect(lambda parent, first, last: events.append(("insert", first)))
+    model.rowsRemoved.connect(lambda parent, first, last: events.append(("remove", first)))
+    model.dataChanged.connect(lambda first, last: events.append(("change", first.row())))
+    model.modelReset.connect(lambda: events.append(("reset",)))
+    return repo, model, events
+
+def rows(model):
+    return [model.note_at(row)["id"] for row in range(model.rowCount())]
+
+def update(repo, model, changed=(), removed=()):
+    return model.update_notes(repo.notes_in(None), set(changed), set(removed))
+
+def test_updates_emit_row_signals_instead_of_reset(app, data_dir):
+    repo, model, events = make_model(3)
+    repo.save_note(make_note("new"))
+    assert update(repo, model, ["new"])
+    repo.update_note("n1", title="renamed")
+    assert update(repo, model, ["n1"])
+    repo.update_note("n0", category_id="work")
+    assert update(repo, model, ["n0"])
+    repo.delete_note("n2")
+    assert update(repo, model, removed=["n2"])
+    assert events == [("insert", 0), ("change", 2), ("remove", 3), ("remove", 1)]
+    assert rows(model) == ["new", "n1"]
+    assert model.data(model.index(1)) == "renamed - 2026-01-01T00:00:00"
+
+def test_rows_beyond_the_loaded_batch_stay_unloaded(app, data_dir):
+    repo, model, events = make_model(FETCH_BATCH_SIZE + 10)
+    repo.delete_note("n0")
+    assert update(repo, model, removed=["n0"])
+    assert events == []
+    repo.save_note(make_note("new"))
+    assert update(repo, model, ["new"])
+    assert events == [("insert", 0)]
+    assert model.rowCount() == FETCH_BATCH_SIZE + 1
+    assert rows(model) == [n["id"] for n in repo.notes_in(None)][:FETCH_BATCH_SIZE + 1]
+    model.fetchMore()
+    assert rows(model) == [n["id"] for n in repo.notes_in(None)]
+
+def test_large_changes_fall_back_to_reset(app, data_dir):
+    repo, model, events = make_model(1)
+    assert not update(repo, model, ["x%d" % i for i in range(FETCH_BATCH_SIZE + 1)])
+    assert events == []
@@ -0,0 +1,66 @@
+import core.outbox
+from core.outbox import Outbox, PENDING, FAILED
+from core.repository import NoteRepository
+from core.store import empty_data
+
+def make_note(nid, title=None, status=PENDING, text="text"):
+    return {"id": nid, "title": title or nid, "note_text": text, "images": ["a.png"], "category_id": None, "favorite": False, "status": status}
+
+def make_outbox(*notes, **kwargs):
+    repo = NoteRepository()
+    repo.load(empty_data())
+    repo.save_notes(list(notes))
+    return repo, Outbox(repo, **kwargs)
+
+def test_due_respects_concurrency(data_dir):
+    repo, outbox = make_outbox(make_note("a"), make_note("b"), make_note("c"), concurrency=2)
+    due = [n["id"] for n in outbox.due(now=0)]
+    assert len(due) == 2
+    for nid in due:
+        outbox.started(nid)
+    assert outbox.due(now=0) == []
+    outbox.succeeded(due[0], "http://x/1")
+    assert [n["id"] for n in outbox.due(now=0)] == [nid for nid in "abc" if nid not in due]
+    note = repo.get(due[0])
+    assert (note["link"], note.get("status")) == ("http://x/1", None)
+
+def test_retryable_failures_back_off_exponentially(data_dir, monkeypatch):
+    monkeypatch.setattr(core.outbox.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(core.outbox.time, "monotonic", lambda: 100.0)
+    repo, outbox = make_outbox(make_note("a"), retry_base=5, retry_max=12)
+    delays = []
+    for _ in range(3):
+        outbox.started("a")
+        outbox.failed("a", True, "offline")
+        delays.append(outbox.next_due_in(now=100.0))
+    assert delays == [5, 10, 12]
+    assert outbox.due(now=111.0) == []
+    assert [n["id"] for n in outbox.due(now=112.0)] == ["a"]
+    assert repo.get("a")["status"] == PENDING
+    outbox.connectivity_restored()
+    assert outbox.next_due_in(now=100.0) == 0
+
+def test_permanent_failure_and_retry_now(data_dir):
+    repo, outbox = make_outbox(make_note("a"))
+    outbox.started("a")
+    outbox.failed("a", False, "rejected")
+    note = repo.get("a")
+    assert (note["status"], note["error"]) == (FAILED, "rejected")
+    assert outbox.due(now=0) == []
+    outbox.retry_now("a")
+    assert repo.get("a")["status"] == PENDING
+    assert [n["id"] for n in outbox.due(now=0)] == ["a"]
+
+def test_find_duplicate_matches_pending_notes_only(data_dir):
+    repo, outbox = make_outbox(make_note("a", "Title"), make_note("b", "Other", FAILED))
+    assert outbox.find_duplicate("title", "text", ["a.png"])["id"] == "a"
+    assert outbox.find_duplicate("Title", "text", []) is None
+    assert outbox.find_duplicate("Title", "changed", ["a.png"]) is None
+    assert outbox.find_duplicate("Other", "text", ["a.png"]) is None
+
+def test_results_for_deleted_notes_are_ignored(data_dir):
+    repo, outbox = make_outbox(make_note("a"))
+    outbox.started("a")
+    repo.delete_note("a")
+    assert outbox.succeeded("a", "http://x/1") is None
+    assert outbox.in_flight == set()
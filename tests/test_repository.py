@@ -0,0 +1,91 @@
+from core.repository import NoteRepository, FAVORITES
+from core.store import empty_data
+
+def make_note(nid, category_id=None, favorite=False, title=None, status=None):
+    note = {"id": nid, "title": title or nid, "note_text": "text " + nid, "images": [], "category_id": category_id, "favorite": favorite}
+    if status:
+        note["status"] = status
+    return note
+
+def make_repo():
+    repo = NoteRepository()
+    repo.load(empty_data())
+    return repo
+
+def ids(view):
+    return [n["id"] for n in view]
+
+def test_indexes_follow_saves_updates_and_deletes(data_dir):
+    repo = make_repo()
+    repo.save_category({"id": "work", "name": "Work"})
+    repo.save_notes([make_note("a", "work"), make_note("b", favorite=True), make_note("c", "work", True)])
+    assert ids(repo.notes_in("work")) == ["c", "a"]
+    assert ids(repo.notes_in(None)) == ["b"]
+    assert ids(repo.notes_in(FAVORITES)) == ["c", "b"]
+    repo.update_note("a", category_id=None, favorite=True)
+    assert ids(repo.notes_in("work")) == ["c"]
+    assert ids(repo.notes_in(None)) == ["b", "a"]
+    assert ids(repo.notes_in(FAVORITES)) == ["c", "b", "a"]
+    repo.delete_note("c")
+    assert repo.get("c") is None
+    assert ids(repo.notes_in("work")) == []
+    assert ids(repo.notes_in(FAVORITES)) == ["b", "a"]
+
+def test_views_follow_later_saves(data_dir):
+    repo = make_repo()
+    repo.save_note(make_note("a"))
+    view = repo.notes_in(None)
+    repo.save_note(make_note("b"))
+    assert len(view) == 2
+    assert view[0]["id"] == "b"
+    assert view[-1]["id"] == "a"
+
+def test_title_and_status_lookups(data_dir):
+    repo = make_repo()
+    repo.save_notes([make_note("a", title="Shopping  List"), make_note("b", title="other", status="pending")])
+    assert [n["id"] for n in repo.find_by_title("shopping list")] == ["a"]
+    assert [n["id"] for n in repo.with_status("pending")] == ["b"]
+    repo.update_note("b", status=None)
+    assert repo.with_status("pending") == []
+    repo.update_note("a", title="Groceries")
+    assert repo.find_by_title("shopping list") == []
+    assert [n["id"] for n in repo.find_by_title("GROCERIES")] == ["a"]
+
+def test_saved_notes_survive_reload(data_dir):
+    repo = make_repo()
+    repo.save_category({"id": "work", "name": "Work"})
+    repo.save_note(make_note("a", "work", True))
+    repo.delete_note("a")
+    repo.save_note(make_note("b", "work"))
+    reloaded = NoteRepository()
+    reloaded.load()
+    assert list(reloaded.notes) == ["b"]
+    assert reloaded.category("work") == {"id": "work", "name": "Work"}
+    assert reloaded.get("b")["note_text"] == "text b"
+
+def test_counts_and_touched_keys(data_dir):
+    repo = make_repo()
+    changes = []
+    repo.subscribe(changes.append)
+    repo.save_category({"id": "work", "name": "Work"})
+    repo.save_notes([make_note("a", "work"), make_note("b", "work", True)])
+    assert (repo.count("work"), repo.count(None), repo.count(FAVORITES)) == (2, 0, 1)
+    assert changes[-1].counts == {"work", FAVORITES}
+    repo.update_note("a", title="renamed")
+    assert changes[-1].counts == set()
+    repo.update_note("a", category_id=None)
+    assert (repo.count("work"), repo.count(None)) == (1, 1)
+    assert changes[-1].counts == {"work", None}
+    repo.delete_note("b")
+    assert (repo.count("work"), repo.count(FAVORITES)) == (0, 0)
+    assert changes[-1].counts == {"work", FAVORITES}
+
+def test_deleting_a_category_moves_its_notes(data_dir):
+    repo = make_repo()
+    repo.save_category({"id": "work", "name": "Work"})
+    repo.save_notes([make_note("a", "work"), make_note("b")])
+    repo.delete_category("work")
+    assert repo.count("work") == 0
+    assert repo.count(None) == 2
+    assert ids(repo.notes_in(None)) == ["b", "a"]
+    assert repo.get("a")["category_id"] is None
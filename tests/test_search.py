@@ -0,0 +1,43 @@
+from core.repository import NoteRepository
+from core.search import SearchIndex, tokenize
+from core.store import empty_data
+
+def make_note(nid, title, text):
+    return {"id": nid, "title": title, "note_text": text, "images": [], "category_id": None, "favorite": False}
+
+def make_index():
+    repo = NoteRepository()
+    repo.load(empty_data())
+    index = SearchIndex()
+    index.attach(repo)
+    return repo, index
+
+def test_tokenize_folds_case():
+    assert tokenize("Hello, WORLD_1 straße") == ["hello", "world_1", "strasse"]
+
+def test_index_follows_repository_changes(data_dir):
+    repo, index = make_index()
+    repo.save_notes([make_note("a", "Groceries", "milk and eggs"), make_note("b", "Work", "quarterly report")])
+    assert index.search("milk") == ["a"]
+    repo.save_note(make_note("c", "Dinner", "buy milk"))
+    assert sorted(index.search("milk")) == ["a", "c"]
+    repo.update_note("a", note_text="bread")
+    assert index.search("milk") == ["c"]
+    assert index.search("bread") == ["a"]
+    repo.delete_note("c")
+    assert index.search("milk") == []
+    assert "milk" not in index.postings
+    assert "milk" not in index.terms
+
+def test_prefix_and_multi_term_queries(data_dir):
+    repo, index = make_index()
+    repo.save_notes([make_note("a", "Report", "quarterly numbers"), make_note("b", "Notes", "quartz watch"), make_note("c", "Other", "quarterly plan")])
+    assert sorted(index.search("quar")) == ["a", "b", "c"]
+    assert sorted(index.search("quarterly")) == ["a", "c"]
+    assert index.search("quarterly report") == ["a"]
+    assert index.search("quarterly missing") == []
+
+def test_title_matches_rank_first(data_dir):
+    repo, index = make_index()
+    repo.save_notes([make_note("a", "Misc", "budget"), make_note("b", "Budget", "numbers")])
+    assert index.search("budget") == ["b", "a"]
@@ -0,0 +1,123 @@
+import os
+import core.store
+from core.store import NoteStore
+
+def make_note(nid, text="text", title=None):
+    return {"id": nid, "title": title or nid, "note_text": text, "images": [], "category_id": None, "favorite": False}
+
+def open_store(tmp_path, **kwargs):
+    kwargs.setdefault("write_delay", 0)
+    return NoteStore(str(tmp_path / "notes.json"), **kwargs)
+
+def note_texts(store, data):
+    out = {}
+    for n in data["notes"]:
+        body = store.read_body(n["body"]) if "body" in n else n
+        out[n["id"]] = body["note_text"]
+    return out
+
+def test_journal_replay(tmp_path):
+    writer = open_store(tmp_path)
+    writer.load()
+    writer.put_category({"id": "c1", "name": "Work"})
+    writer.put_note(make_note("a", "first"))
+    writer.put_note(make_note("b"))
+    writer.put_note(make_note("a", "second"))
+    writer.remove_note("b")
+    assert os.path.exists(writer.journal_path)
+    reader = open_store(tmp_path)
+    data = reader.load()
+    assert [n["id"] for n in data["notes"]] == ["a"]
+    assert note_texts(reader, data) == {"a": "second"}
+    assert data["categories"] == [{"id": "c1", "name": "Work"}]
+
+def test_torn_last_line_is_ignored_and_repaired(tmp_path):
+    store = open_store(tmp_path)
+    store.load()
+    store.put_note(make_note("a"))
+    with open(store.journal_path, "ab") as f:
+        f.write(b'{"op":"note","note":{"id":"torn"')
+    data = open_store(tmp_path).load()
+    assert [n["id"] for n in data["notes"]] == ["a"]
+    writer = open_store(tmp_path)
+    writer.load()
+    writer.put_note(make_note("b"))
+    data = open_store(tmp_path).load()
+    assert sorted(n["id"] for n in data["notes"]) == ["a", "b"]
+
+def test_compaction_moves_journal_into_snapshot(tmp_path):
+    store = open_store(tmp_path, compact_threshold=3)
+    store.load()
+    for nid in ("a", "b", "c"):
+        store.put_note(make_note(nid, "body " + nid))
+    assert not os.path.exists(store.journal_path)
+    assert os.path.exists(store.bodies_file(1))
+    reader = open_store(tmp_path)
+    data = reader.load()
+    assert all("body" in n and "note_text" not in n for n in data["notes"])
+    assert note_texts(reader, data) == {"a": "body a", "b": "body b", "c": "body c"}
+
+def test_bodies_generation_switch(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.store, "BODY_GC_MIN_BYTES", 0)
+    writer = open_store(tmp_path, compact_threshold=1)
+    writer.load()
+    for i in range(3):
+        writer.put_note(make_note("a", "version %d" % i))
+    reader = open_store(tmp_path)
+    data = reader.load()
+    assert reader.bodies_generation == 2
+    assert note_texts(reader, data) == {"a": "version 2"}
+    assert os.path.exists(reader.bodies_file(2))
+    data, entries = writer.poll()
+    assert entries == []
+    assert writer.reader_generation == 2
+    assert note_texts(writer, data) == {"a": "version 2"}
+
+def test_poll_picks_up_other_process_appends(tmp_path):
+    ours = open_store(tmp_path)
+    ours.load()
+    theirs = open_store(tmp_path)
+    theirs.load()
+    assert not ours.changed()
+    assert ours.poll() == (None, [])
+    theirs.put_note(make_note("a"))
+    theirs.remove_category("c1")
+    assert ours.changed()
+    data, entries = ours.poll()
+    assert data is None
+    assert [e["op"] for e in entries] == ["note", "category_del"]
+    assert entries[0]["note"]["id"] == "a"
+    assert not ours.changed()
+    assert ours.poll() == (None, [])
+    theirs.compact()
+    assert ours.changed()
+    data, entries = ours.poll()
+    assert entries == []
+    assert [n["id"] for n in data["notes"]] == ["a"]
+
+def test_own_appends_do_not_need_a_poll(tmp_path):
+    ours = open_store(tmp_path)
+    ours.load()
+    theirs = open_store(tmp_path)
+    theirs.load()
+    ours.put_note(make_note("a"))
+    assert not ours.changed()
+    theirs.put_note(make_note("b"))
+    ours.put_note(make_note("c"))
+    assert ours.changed()
+    data, entries = ours.poll()
+    assert [e["note"]["id"] for e in entries] == ["b"]
+    assert not ours.changed()
+
+def test_images_lifted_from_legacy_bodies(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.store, "BODY_FIELDS", ("note_text", "images", "hashes"))
+    legacy = open_store(tmp_path, compact_threshold=1)
+    legacy.load()
+    legacy.put_note(dict(make_note("a"), images=["blobs/ab/ab.png"]))
+    monkeypatch.undo()
+    store = open_store(tmp_path)
+    assert store.load()["notes"][0]["images"] == ["blobs/ab/ab.png"]
+    reader = open_store(tmp_path)
+    data = reader.read_snapshot()
+    assert not reader.snapshot_legacy
+    assert data["notes"][0]["images"] == ["blobs/ab/ab.png"]
@@ -0,0 +1,85 @@
+import json
+import pytest
+from core.repository import NoteRepository
+from core.store import empty_data
+from core.transfer import export_notes, import_notes, TransferError, FORMAT_NAME, FORMAT_VERSION
+
+def make_note(nid, title, text, category_id=None, images=()):
+    return {"id": nid, "title": title, "note_text": text, "images": list(images), "category_id": category_id, "favorite": False}
+
+def make_repo():
+    repo = NoteRepository()
+    repo.load(empty_data())
+    return repo
+
+def write_records(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(record if isinstance(record, str) else json.dumps(record))
+            f.write("\n")
+
+def run_import(path, repo, **kwargs):
+    stats = None
+    for stats in import_notes(str(path), repo, **kwargs):
+        pass
+    return stats
+
+def test_import_maps_categories_and_skips_duplicates(data_dir):
+    repo = make_repo()
+    repo.save_category({"id": "local", "name": "Work"})
+    repo.save_note(make_note("old", "Existing note", "same text"))
+    write_records(data_dir / "in.ndjson", [
+        {"format": FORMAT_NAME, "version": FORMAT_VERSION},
+        {"category": {"id": "remote", "name": "work "}},
+        {"category": {"id": "ideas", "name": "Ideas"}},
+        {"category": {"id": "broken"}},
+        {"note": make_note("n1", "First", "one", "remote")},
+        {"note": make_note("n2", "Second", "two", "ideas")},
+        {"note": make_note("n3", "Third", "three", "unknown")},
+        {"note": make_note("n1", "First again", "other")},
+        {"note": make_note("n4", "first", "one")},
+        {"note": make_note("n5", "existing  NOTE", "same text")},
+        {"note": make_note("old", "Renamed", "new text")},
+        {"note": {"id": "n6", "note_text": "no title"}},
+        "not json",
+    ])
+    stats = run_import(data_dir / "in.ndjson", repo, batch_size=2)
+    assert (stats["added"], stats["categories"], stats["duplicates"], stats["invalid"]) == (3, 1, 4, 3)
+    assert {c["id"] for c in repo.categories()} == {"local", "ideas"}
+    assert repo.get("n1")["category_id"] == "local"
+    assert repo.get("n2")["category_id"] == "ideas"
+    assert repo.get("n3")["category_id"] is None
+    assert repo.get("old")["title"] == "Existing note"
+    assert repo.get("n4") is None and repo.get("n5") is None
+
+def test_import_drops_unknown_fields(data_dir):
+    repo = make_repo()
+    note = dict(make_note("n1", "First", "one"), status="pending", error="boom", extra=1)
+    write_records(data_dir / "in.ndjson", [{"note": note}])
+    run_import(data_dir / "in.ndjson", repo)
+    stored = dict(repo.get("n1"))
+    assert "status" not in stored and "error" not in stored and "extra" not in stored
+    assert repo.with_status("pending") == []
+
+def test_import_rejects_newer_format(data_dir):
+    write_records(data_dir / "in.ndjson", [{"format": FORMAT_NAME, "version": FORMAT_VERSION + 1}])
+    with pytest.raises(TransferError):
+        run_import(data_dir / "in.ndjson", make_repo())
+
+def test_bundle_round_trip_restores_images(data_dir):
+    image = data_dir / "photo.png"
+    image.write_bytes(b"PNGDATA")
+    repo = make_repo()
+    repo.save_category({"id": "work", "name": "Work"})
+    repo.save_note(make_note("n1", "Photo", "with image", "work", [str(image)]))
+    for _ in export_notes(str(data_dir / "out.zip"), repo):
+        pass
+    repo.delete_note("n1")
+    image.unlink()
+    stats = run_import(data_dir / "out.zip", repo, image_dir=str(data_dir / "imported"))
+    assert stats["added"] == 1
+    images = repo.get("n1")["images"]
+    assert len(images) == 1
+    with open(images[0], "rb") as f:
+        assert f.read() == b"PNGDATA"
+    assert repo.get("n1")["category_id"] == "work"
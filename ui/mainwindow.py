@@ -1,8 +1,10 @@
-from PyQt5.QtWidgets import QMainWindow, QStackedWidget, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QPushButton, QFrame
+from PyQt5.QtWidgets import QMainWindow, QStackedWidget, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QPushButton, QFrame, QProgressBar, QMessageBox
+from PyQt5.QtCore import QEvent, QTimer
 from PyQt5.QtGui import QIcon
-from ui.pages.new_note import NewNoteWidget
-from ui.pages.my_notes import MyNotesWidget
-from ui.pages.settings import SettingsWidget
+from core.repository import repository
+from core.startup import startup_timer
+from core.metrics import metrics
+from ui.workers import get_upload_executor, DataWorker, run_data_worker
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -12,6 +14,11 @@ class MainWindow(QMainWindow):
         self.resize(1200, 700)
         self.setWindowOpacity(0.95)
         self.current_theme = "dark"
+        self.pages = {}
+        self.detail_page = None
+        self.edit_page = None
+        self.load_callbacks = []
+        self.loading = False
         self.init_ui()
     def init_ui(self):
         self.setStyleSheet(self.get_stylesheet(self.current_theme))
@@ -23,25 +30,23 @@ class MainWindow(QMainWindow):
         header_layout.addWidget(title)
         header_layout.addStretch()
         btn_settings = QPushButton("Settings")
-        btn_settings.clicked.connect(lambda: self.stack.setCurrentWidget(self.settings_page))
+        btn_settings.clicked.connect(lambda: self.show_page("settings"))
         header_layout.addWidget(btn_settings)
+        if metrics.enabled:
+            btn_diagnostics = QPushButton("Diagnostics")
+            btn_diagnostics.clicked.connect(lambda: self.show_page("diagnostics"))
+            header_layout.addWidget(btn_diagnostics)
         nav = QFrame()
         nav.setObjectName("nav")
         nav_layout = QVBoxLayout(nav)
         btn_new = QPushButton("New Note")
-        btn_new.clicked.connect(lambda: self.stack.setCurrentWidget(self.new_note_page))
+        btn_new.clicked.connect(lambda: self.show_page("new"))
         btn_notes = QPushButton("My Notes")
-        btn_notes.clicked.connect(lambda: self.stack.setCurrentWidget(self.my_notes_page))
+        btn_notes.clicked.connect(lambda: self.show_page("notes"))
         nav_layout.addWidget(btn_new)
         nav_layout.addWidget(btn_notes)
         nav_layout.addStretch()
         self.stack = QStackedWidget()
-        self.new_note_page = NewNoteWidget(self.on_notes_updated)
-        self.my_notes_page = MyNotesWidget(self.open_note_detail, self.open_edit_note)
-        self.settings_page = SettingsWidget(self.change_theme, self.current_theme)
-        self.stack.addWidget(self.new_note_page)
-        self.stack.addWidget(self.my_notes_page)
-        self.stack.addWidget(self.settings_page)
         central_widget = QWidget()
         central_layout = QVBoxLayout(central_widget)
         central_layout.addWidget(header)
@@ -50,28 +55,103 @@ class MainWindow(QMainWindow):
         body_layout.addWidget(self.stack, 4)
         central_layout.addLayout(body_layout)
         self.setCentralWidget(central_widget)
+        self.loading_label = QLabel("Loading notes...")
+        self.loading_bar = QProgressBar()
+        self.loading_bar.setRange(0, 0)
+        self.loading_bar.setMaximumWidth(120)
+        self.statusBar().addPermanentWidget(self.loading_label)
+        self.statusBar().addPermanentWidget(self.loading_bar)
+        self.set_loading(False)
+        get_upload_executor().active_changed.connect(self.on_uploads_changed)
+        self.installEventFilter(self)
+        QTimer.singleShot(0, lambda: self.show_page("new"))
+    def eventFilter(self, obj, event):
+        if obj is self and event.type() == QEvent.Paint:
+            startup_timer.mark("first_paint")
+            self.removeEventFilter(self)
+        return super().eventFilter(obj, event)
+    def page(self, name):
+        page = self.pages.get(name)
+        if page is None:
+            if name == "new":
+                from ui.pages.new_note import NewNoteWidget
+                page = NewNoteWidget(self.on_notes_updated)
+            elif name == "notes":
+                from ui.pages.my_notes import MyNotesWidget
+                page = MyNotesWidget(self.open_note_detail, self.open_edit_note, self.load_data)
+            elif name == "diagnostics":
+                from ui.pages.diagnostics import DiagnosticsWidget
+                page = DiagnosticsWidget()
+            else:
+                from ui.pages.settings import SettingsWidget
+                page = SettingsWidget(self.change_theme, self.current_theme)
+            self.pages[name] = page
+            self.stack.addWidget(page)
+        return page
+    def show_page(self, name):
+        self.stack.setCurrentWidget(self.page(name))
+    @property
+    def new_note_page(self):
+        return self.page("new")
+    @property
+    def my_notes_page(self):
+        return self.page("notes")
+    @property
+    def settings_page(self):
+        return self.page("settings")
+    def set_loading(self, loading):
+        self.loading = loading
+        self.loading_label.setVisible(loading)
+        self.loading_bar.setVisible(loading)
+    def load_data(self, callback=None):
+        if callback is not None:
+            self.load_callbacks.append(callback)
+        if self.loading:
+            return
+        self.set_loading(True)
+        mutations = repository.mutations
+        def on_loaded(data):
+            if repository.mutations == mutations:
+                repository.load(data)
+            else:
+                repository.load()
+            self.on_load_finished()
+        def on_error(message):
+            repository.load({"categories": [], "notes": []})
+            self.on_load_finished()
+            QMessageBox.warning(self, "Error", "Could not load notes: " + message)
+        run_data_worker(DataWorker.load, on_loaded, on_error)
+    def on_load_finished(self):
+        self.set_loading(False)
+        callbacks, self.load_callbacks = self.load_callbacks, []
+        for callback in callbacks:
+            callback()
+    def on_uploads_changed(self, count):
+        if count:
+            self.statusBar().showMessage("Sharing " + str(count) + (" note..." if count == 1 else " notes..."))
+        else:
+            self.statusBar().clearMessage()
     def on_notes_updated(self):
-        self.my_notes_page.refresh_data()
-        self.stack.setCurrentWidget(self.my_notes_page)
+        self.show_page("notes")
     def open_note_detail(self, note):
-        from ui.pages.note_detail import NoteDetailWidget
-        from ui.pages.edit_note import EditNoteWidget
-        detail = NoteDetailWidget(note, back_callback=lambda: self.stack.setCurrentWidget(self.my_notes_page), edit_callback=self.open_edit_note)
-        if self.stack.count() > 3:
-            w = self.stack.widget(3)
-            self.stack.removeWidget(w)
-            w.deleteLater()
-        self.stack.addWidget(detail)
-        self.stack.setCurrentWidget(detail)
+        if self.detail_page is None:
+            from ui.pages.note_detail import NoteDetailWidget
+            self.detail_page = NoteDetailWidget(None, back_callback=lambda: self.show_page("notes"), edit_callback=self.open_edit_note, page_callback=self.page_note)
+            self.stack.addWidget(self.detail_page)
+        self.detail_page.set_note(note)
+        self.stack.setCurrentWidget(self.detail_page)
+        self.detail_page.setFocus()
+    def page_note(self, note_id, step):
+        note = self.my_notes_page.adjacent_note(note_id, step)
+        if note is not None:
+            self.detail_page.set_note(note)
     def open_edit_note(self, note):
-        from ui.pages.edit_note import EditNoteWidget
-        edit = EditNoteWidget(note, notes_update_callback=self.on_notes_updated)
-        if self.stack.count() > 3:
-            w = self.stack.widget(3)
-            self.stack.removeWidget(w)
-            w.deleteLater()
-        self.stack.addWidget(edit)
-        self.stack.setCurrentWidget(edit)
+        if self.edit_page is None:
+            from ui.pages.edit_note import EditNoteWidget
+            self.edit_page = EditNoteWidget(None, notes_update_callback=self.on_notes_updated)
+            self.stack.addWidget(self.edit_page)
+        self.edit_page.set_note(note)
+        self.stack.setCurrentWidget(self.edit_page)
     def change_theme(self, theme):
         self.current_theme = theme
         self.setStyleSheet(self.get_stylesheet(theme))
@@ -83,7 +163,7 @@ class MainWindow(QMainWindow):
             #headerTitle { color: white; font-size: 24px; font-weight: bold; }
             QPushButton { background-color: #505050; color: white; border: none; padding: 8px 16px; border-radius: 4px; }
             QPushButton:hover { background-color: #606060; }
-            QLineEdit, QTextEdit, QListWidget { background-color: #3b3b3b; color: white; border: 1px solid #555; border-radius: 4px; }
+            QLineEdit, QTextEdit, QListView { background-color: #3b3b3b; color: white; border: 1px solid #555; border-radius: 4px; }
             QLabel { color: white; }
             QFrame#nav { background-color: #3b3b3b; padding: 10px; }
             """
@@ -94,7 +174,7 @@ class MainWindow(QMainWindow):
             #headerTitle { color: #333; font-size: 24px; font-weight: bold; }
             QPushButton { background-color: #d0d0d0; color: #333; border: none; padding: 8px 16px; border-radius: 4px; }
             QPushButton:hover { background-color: #c0c0c0; }
-            QLineEdit, QTextEdit, QListWidget { background-color: white; color: #333; border: 1px solid #aaa; border-radius: 4px; }
+            QLineEdit, QTextEdit, QListView { background-color: white; color: #333; border: 1px solid #aaa; border-radius: 4px; }
             QLabel { color: #333; }
             QFrame#nav { background-color: #e0e0e0; padding: 10px; }
             """
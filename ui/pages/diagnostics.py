@@ -0,0 +1,69 @@
+import os
+import time
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QPlainTextEdit, QHeaderView
+from PyQt5.QtCore import QTimer
+from core.metrics import metrics, METRICS_ENV
+
+REFRESH_INTERVAL = 1000
+SHOWN_EVENTS = 50
+
+class DiagnosticsWidget(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+        self.init_ui()
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Diagnostics"))
+        if metrics.enabled:
+            info = QLabel("Recording to " + os.path.abspath(metrics.log_path))
+        else:
+            info = QLabel("Instrumentation is off. Start the app with " + METRICS_ENV + "=1 to record timings.")
+        info.setWordWrap(True)
+        layout.addWidget(info)
+        self.timer_table = QTableWidget(0, 5)
+        self.timer_table.setHorizontalHeaderLabels(["Timer", "Count", "Avg ms", "Max ms", "Last ms"])
+        self.timer_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.timer_table.verticalHeader().setVisible(False)
+        self.timer_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.timer_table, 2)
+        self.counter_label = QLabel()
+        self.counter_label.setWordWrap(True)
+        layout.addWidget(self.counter_label)
+        self.events_view = QPlainTextEdit()
+        self.events_view.setReadOnly(True)
+        layout.addWidget(self.events_view, 1)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        btn_reset = QPushButton("Reset")
+        btn_reset.clicked.connect(self.reset)
+        buttons.addWidget(btn_reset)
+        layout.addLayout(buttons)
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start()
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+    def refresh(self):
+        snap = metrics.snapshot()
+        timers = sorted(snap["timers"].items())
+        self.timer_table.setRowCount(len(timers))
+        for row, (name, stats) in enumerate(timers):
+            cells = [name, str(stats["count"])] + ["%.1f" % stats[k] for k in ("avg_ms", "max_ms", "last_ms")]
+            for col, text in enumerate(cells):
+                self.timer_table.setItem(row, col, QTableWidgetItem(text))
+        self.counter_label.setText("   ".join("%s: %d" % item for item in sorted(snap["counters"].items())))
+        lines = []
+        for event in reversed(snap["events"][-SHOWN_EVENTS:]):
+            fields = ", ".join("%s=%s" % (k, v) for k, v in event.items() if k not in ("name", "ms", "time", "stack") and v is not None)
+            lines.append("%s  %s  %.1f ms  %s" % (time.strftime("%H:%M:%S", time.localtime(event["time"])), event["name"], event["ms"], fields))
+            if event.get("stack"):
+                lines.append(event["stack"].rstrip())
+        self.events_view.setPlainText("\n".join(lines))
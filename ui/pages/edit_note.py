@@ -1,29 +1,43 @@
-import os
-from PyQt5.QtWidgets import QListWidgetItem, QMessageBox
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtWidgets import QMessageBox
+from PyQt5 import sip
 from ui.pages.new_note import NewNoteWidget
-from core.api import send_note_api
-from core.data import save_data_sync
+from ui.workers import get_upload_executor
+from core.digests import text_digest
+from core.drafts import draft_store, draft_digest
 from PyQt5.QtWidgets import QApplication
 
+def draft_key(note_id):
+    return "edit-" + note_id
+
 class EditNoteWidget(NewNoteWidget):
+    DRAFT_KEY = None
     def __init__(self, note, notes_update_callback):
         super().__init__(notes_update_callback)
+        self.btn_batch_share.hide()
+        self.note = None
+        self.updating = set()
+        if note is not None:
+            self.set_note(note)
+    def set_note(self, note):
+        self.autosave.rebind(None)
         self.note = note
-        self.btn_share_note.setText("Update Note")
+        self.reset_form()
+        self.note_url = None
         self.populate_fields()
+        self.autosave.rebind(draft_key(note["id"]), draft_digest(self.draft_fields()))
+        self.restore_draft()
+        self.update_share_button()
+    def update_share_button(self):
+        busy = self.note is not None and self.note["id"] in self.updating
+        self.btn_share_note.setEnabled(not busy)
+        self.btn_share_note.setText("Updating..." if busy else "Update Note")
     def populate_fields(self):
         self.title_edit.setText(self.note.get("title", ""))
         self.note_edit.setText(self.note.get("note_text", ""))
-        self.selected_images = self.note.get("images", [])
+        self.selected_images = []
         self.image_list.clear()
-        for img in self.selected_images:
-            item = QListWidgetItem(os.path.basename(img))
-            pix = QPixmap(img)
-            if not pix.isNull():
-                item.setIcon(QIcon(pix.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)))
-            self.image_list.addItem(item)
+        for img in self.note.get("images", []):
+            self.add_image(img)
         link = self.note.get("link", "")
         if link:
             self.note_url = link
@@ -37,29 +51,37 @@ class EditNoteWidget(NewNoteWidget):
             QMessageBox.warning(self, "Error", "Title and Content cannot be empty!")
             return
         payload = {"title": title, "content": content}
-        try:
-            resp = send_note_api(payload, self.selected_images)
-        except Exception as e:
-            QMessageBox.warning(self, "Network Error", str(e))
+        images = list(self.selected_images)
+        note = self.note
+        if note.get("link") and list(note.get("images", [])) == images and (note.get("hashes") or {}).get("text") == text_digest(title, content):
+            QMessageBox.information(self, "No Changes", "The note has not changed.\nLink: " + note["link"])
+            return
+        self.updating.add(note["id"])
+        self.update_share_button()
+        get_upload_executor().submit(payload, images, lambda link, local: self.on_share_finished(note, title, content, local, link), lambda err_title, message, retryable, local: self.on_share_error(note, title, content, images, err_title, message, retryable))
+    def on_share_finished(self, note, title, content, local, link):
+        self.save_to_local(title, content, local, link, note_id=note["id"], category_id=note.get("category_id"), favorite=note.get("favorite", False))
+        draft_store.discard(draft_key(note["id"]))
+        QApplication.instance().tray_icon.showMessage("Note Updated", f"Note '{title}' has been updated.\nNew Link: {link}", QApplication.instance().tray_icon.Information, 5000)
+        if sip.isdeleted(self):
+            return
+        self.updating.discard(note["id"])
+        self.update_share_button()
+        if self.note is None or self.note["id"] != note["id"]:
+            return
+        self.note_url = link
+        QMessageBox.information(self, "Success", "Note updated!\nNew Link: " + link)
+        self.url_label.setText(link)
+        self.url_label.show()
+        self.btn_copy_url.show()
+        self.notes_update_callback()
+        self.reset_form(True)
+    def on_share_error(self, note, title, content, images, err_title, message, retryable):
+        message = message.replace("Could not share note", "Could not update note")
+        if not sip.isdeleted(self):
+            self.updating.discard(note["id"])
+            self.update_share_button()
+        if sip.isdeleted(self) or self.note is None or self.note["id"] != note["id"]:
+            QApplication.instance().tray_icon.showMessage(err_title, message, QApplication.instance().tray_icon.Warning, 5000)
             return
-        if resp.status_code == 200:
-            try:
-                js = resp.json()
-            except Exception:
-                QMessageBox.warning(self, "Error", "JSON parse error.")
-                return
-            if js.get("success"):
-                link = js.get("link", "Unknown")
-                self.note_url = link
-                QMessageBox.information(self, "Success", "Note updated!\nNew Link: " + link)
-                QApplication.instance().tray_icon.showMessage("Note Updated", f"Note '{title}' has been updated.\nNew Link: {link}", QApplication.instance().tray_icon.Information, 5000)
-                self.url_label.setText(link)
-                self.url_label.show()
-                self.btn_copy_url.show()
-                self.save_to_local(title, content, self.selected_images, link, note_id=self.note["id"], category_id=self.note.get("category_id"), favorite=self.note.get("favorite", False))
-                self.notes_update_callback()
-                self.reset_form(True)
-            else:
-                QMessageBox.warning(self, "API Error", "Could not update note: " + js.get("error", "Unknown API error"))
-        else:
-            QMessageBox.warning(self, "HTTP Error", "Status: " + str(resp.status_code) + "\n" + resp.text)
+        QMessageBox.warning(self, err_title, message)
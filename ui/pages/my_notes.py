@@ -1,15 +1,21 @@
 import uuid
-from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel, QPushButton, QListWidgetItem, QInputDialog, QMessageBox
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel, QPushButton, QListWidgetItem, QInputDialog, QMessageBox, QLineEdit
 from PyQt5.QtCore import Qt, QEvent
 
-from core.data import load_data_sync, save_data_sync
+from core.repository import repository, FAVORITES
+from core.search import search_index
 from ui.widgets import CategoryListWidget, NoteListWidget
 
+SEARCH_RESULTS = "search"
+
 class MyNotesWidget(QWidget):
-    def __init__(self, open_note_callback, open_edit_callback):
+    def __init__(self, open_note_callback, open_edit_callback, reload_callback):
         super().__init__()
         self.open_note_callback = open_note_callback
         self.open_edit_callback = open_edit_callback
+        self.reload_callback = reload_callback
+        self.category_items = {}
+        self.shown_category = None
         self.init_ui()
 
     def init_ui(self):
@@ -18,6 +24,9 @@ class MyNotesWidget(QWidget):
         right_panel = QVBoxLayout()
         self.cat_list = CategoryListWidget()
         self.note_list = NoteListWidget()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search notes...")
+        self.search_edit.setClearButtonEnabled(True)
         self.btn_new_cat = QPushButton("New Category")
         self.btn_rename_cat = QPushButton("Rename Category")
         self.btn_del_cat = QPushButton("Delete Category")
@@ -25,7 +34,7 @@ class MyNotesWidget(QWidget):
 
         left_panel.addWidget(QLabel("Categories"))
         fav = QListWidgetItem("Favorites")
-        fav.setData(Qt.UserRole, "favorites")
+        fav.setData(Qt.UserRole, FAVORITES)
         self.cat_list.addItem(fav)
         self.cat_list.addItem(QListWidgetItem("Uncategorized"))
         left_panel.addWidget(self.cat_list)
@@ -34,139 +43,159 @@ class MyNotesWidget(QWidget):
         left_panel.addWidget(self.btn_del_cat)
         left_panel.addWidget(self.btn_refresh)
         right_panel.addWidget(QLabel("Notes"))
+        right_panel.addWidget(self.search_edit)
         right_panel.addWidget(self.note_list)
         main_layout.addLayout(left_panel, 1)
         main_layout.addLayout(right_panel, 2)
 
-        self.note_list.itemDoubleClicked.connect(self.on_note_doubleclick)
-        self.cat_list.itemClicked.connect(self.load_notes_for_category)
+        self.note_list.doubleClicked.connect(self.on_note_doubleclick)
+        self.cat_list.itemClicked.connect(self.on_category_clicked)
+        self.search_edit.textChanged.connect(self.on_search_changed)
+        self.search_edit.installEventFilter(self)
         self.btn_new_cat.clicked.connect(self.new_category)
         self.btn_rename_cat.clicked.connect(self.rename_category)
         self.btn_del_cat.clicked.connect(self.delete_category)
-        self.btn_refresh.clicked.connect(self.refresh_data)
+        self.btn_refresh.clicked.connect(lambda: self.reload_callback())
         self.cat_list.viewport().installEventFilter(self)
         self.note_list.viewport().installEventFilter(self)
+        repository.subscribe(self.on_repository_changed)
         self.refresh_data()
 
     def eventFilter(self, obj, event):
+        if event.type() == QEvent.FocusIn and obj == self.search_edit:
+            search_index.build_in_background()
         if event.type() == QEvent.Drop:
             if obj == self.cat_list.viewport():
                 idx = self.cat_list.indexAt(event.pos())
                 if idx.isValid():
                     item = self.cat_list.item(idx.row())
                     cid = item.data(Qt.UserRole)
-                    mime = self.cat_list.mimeData(self.note_list.selectedItems())
-                    nid = mime.text()
-                    d = load_data_sync()
-                    note_obj = None
-                    for n in d["notes"]:
-                        if n["id"] == nid:
-                            note_obj = n
-                            break
-                    if note_obj:
-                        note_obj["category_id"] = cid
+                    nid = event.mimeData().text()
+                    if repository.get(nid):
                         try:
-                            save_data_sync(d)
+                            if cid == FAVORITES:
+                                repository.update_note(nid, favorite=True)
+                            else:
+                                repository.update_note(nid, category_id=cid)
                         except Exception:
                             pass
-                    self.refresh_data()
         return super().eventFilter(obj, event)
 
+    def on_repository_changed(self, change):
+        if change.categories:
+            self.load_categories()
+        else:
+            self.update_counts(change.counts)
+        if self.search_edit.text().strip():
+            self.show_search(self.search_edit.text(), True)
+        else:
+            self.load_notes_for_category(self.cat_list.currentItem(), change)
+
+    def on_category_clicked(self, item):
+        if self.search_edit.text():
+            self.search_edit.blockSignals(True)
+            self.search_edit.clear()
+            self.search_edit.blockSignals(False)
+        self.load_notes_for_category(item)
+
+    def on_search_changed(self, text):
+        if not text.strip():
+            self.load_notes_for_category(self.cat_list.currentItem())
+            return
+        self.show_search(text)
+
+    def show_search(self, text, keep_position=False):
+        self.shown_category = SEARCH_RESULTS
+        notes = [repository.get(nid) for nid in search_index.search(text)]
+        self.note_list.set_notes([n for n in notes if n is not None], keep_position)
+
     def refresh_data(self):
         self.load_categories()
         self.load_notes_for_category()
 
     def load_categories(self):
-        d = load_data_sync()
+        current = self.cat_list.currentItem()
+        current_id = current.data(Qt.UserRole) if current else None
         self.cat_list.clear()
-        fav = QListWidgetItem("Favorites")
-        fav.setData(Qt.UserRole, "favorites")
-        self.cat_list.addItem(fav)
-        unc = QListWidgetItem("Uncategorized")
-        unc.setData(Qt.UserRole, None)
-        self.cat_list.addItem(unc)
-        for c in d["categories"]:
-            item = QListWidgetItem(c["name"])
-            item.setData(Qt.UserRole, c["id"])
+        self.category_items = {}
+        for cid, name in [(FAVORITES, "Favorites"), (None, "Uncategorized")] + [(c["id"], c["name"]) for c in repository.categories()]:
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, cid)
+            item.setData(Qt.UserRole + 1, name)
+            self.category_items[cid] = item
             self.cat_list.addItem(item)
+        self.update_counts(self.category_items)
+        for row in range(self.cat_list.count()):
+            if self.cat_list.item(row).data(Qt.UserRole) == current_id:
+                self.cat_list.setCurrentRow(row)
+                break
+
+    def update_counts(self, category_ids):
+        for cid in category_ids:
+            item = self.category_items.get(cid)
+            if item is not None:
+                item.setText("%s (%d)" % (item.data(Qt.UserRole + 1), repository.count(cid)))
 
-    def load_notes_for_category(self, item=None):
-        d = load_data_sync()
-        self.note_list.clear()
+    def load_notes_for_category(self, item=None, change=None):
         cid = item.data(Qt.UserRole) if item else None
-        for n in reversed(d["notes"]):
-            if cid == "favorites":
-                if n.get("favorite", False):
-                    it = QListWidgetItem(n["title"] + " - " + n["timestamp"])
-                    it.setData(Qt.UserRole, n["id"])
-                    self.note_list.addItem(it)
-            elif cid is None:
-                if n["category_id"] is None:
-                    it = QListWidgetItem(n["title"] + " - " + n["timestamp"])
-                    it.setData(Qt.UserRole, n["id"])
-                    self.note_list.addItem(it)
-            else:
-                if n["category_id"] == cid:
-                    it = QListWidgetItem(n["title"] + " - " + n["timestamp"])
-                    it.setData(Qt.UserRole, n["id"])
-                    self.note_list.addItem(it)
-
-    def on_note_doubleclick(self, item):
-        nid = item.data(Qt.UserRole)
-        d = load_data_sync()
-        for n in d["notes"]:
-            if n["id"] == nid:
-                self.open_note_callback(n)
-                break
+        notes = repository.notes_in(cid)
+        if change is not None and cid == self.shown_category:
+            self.note_list.update_notes(notes, change.notes, change.removed)
+        else:
+            self.note_list.set_notes(notes)
+        self.shown_category = cid
+
+    def on_note_doubleclick(self, index):
+        n = repository.get(index.data(Qt.UserRole))
+        if n:
+            self.open_note_callback(n)
+
+    def adjacent_note(self, note_id, step):
+        model = self.note_list.model()
+        row = model.row_of(note_id, self.note_list.currentIndex().row())
+        if row < 0:
+            return None
+        row += step
+        if row >= model.rowCount() and model.canFetchMore():
+            model.fetchMore()
+        note = model.note_at(row)
+        if note is not None:
+            self.note_list.setCurrentIndex(model.index(row))
+        return note
 
     def new_category(self):
         text, ok = QInputDialog.getText(self, "New Category", "Category Name:")
         if ok and text.strip():
-            d = load_data_sync()
             cid = str(uuid.uuid4())
-            d["categories"].append({"id": cid, "name": text.strip()})
             try:
-                save_data_sync(d)
+                repository.save_category({"id": cid, "name": text.strip()})
             except Exception:
                 pass
-            self.refresh_data()
 
     def rename_category(self):
         sel = self.cat_list.currentItem()
         if not sel:
             return
         cid = sel.data(Qt.UserRole)
-        if cid in ("favorites", None):
+        if cid in (FAVORITES, None):
             return
-        d = load_data_sync()
-        new_name, ok = QInputDialog.getText(self, "Rename Category", "New Name:", text=sel.text())
+        new_name, ok = QInputDialog.getText(self, "Rename Category", "New Name:", text=sel.data(Qt.UserRole + 1))
         if ok and new_name.strip():
-            for c in d["categories"]:
-                if c["id"] == cid:
-                    c["name"] = new_name.strip()
-                    break
             try:
-                save_data_sync(d)
+                repository.save_category({"id": cid, "name": new_name.strip()})
             except Exception:
                 pass
-            self.refresh_data()
 
     def delete_category(self):
         sel = self.cat_list.currentItem()
         if not sel:
             return
         cid = sel.data(Qt.UserRole)
-        if cid in ("favorites", None):
+        if cid in (FAVORITES, None):
             return
         res = QMessageBox.question(self, "Delete Category", "Delete this category?", QMessageBox.Yes | QMessageBox.No)
         if res == QMessageBox.Yes:
-            d = load_data_sync()
-            d["categories"] = [c for c in d["categories"] if c["id"] != cid]
-            for n in d["notes"]:
-                if n["category_id"] == cid:
-                    n["category_id"] = None
             try:
-                save_data_sync(d)
+                repository.delete_category(cid)
             except Exception:
                 pass
-            self.refresh_data()
@@ -2,20 +2,28 @@ import os
 import uuid
 from datetime import datetime
 from io import BytesIO
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QTextEdit, QListWidget, QListWidgetItem, QMessageBox, QFileDialog, QApplication
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QTextEdit, QListWidget, QListWidgetItem, QMessageBox, QFileDialog, QApplication, QMenu, QProgressDialog
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QIcon, QPixmap
-from core.data import load_data_sync, save_data_sync
-from core.api import send_note_api
+from PyQt5 import sip
+from core.repository import repository
+from ui.workers import get_upload_executor, get_outbox_sync, BatchPublishJob, DraftAutosave
+from core.outbox import PENDING
+from core.publisher import drafts_from_folder, drafts_from_notes
+from core.transfer import read_notes
 from ui.widgets import NoteListWidget
+from ui.thumbnails import get_thumbnail_service
 
 class NewNoteWidget(QWidget):
+    DRAFT_KEY = "new"
     def __init__(self, notes_update_callback):
         super().__init__()
         self.notes_update_callback = notes_update_callback
         self.selected_images = []
         self.note_url = None
         self.init_ui()
+        self.autosave = DraftAutosave(self.DRAFT_KEY, self.draft_fields, [self.title_edit, self.note_edit], self)
+        self.restore_draft()
     def init_ui(self):
         layout = QVBoxLayout(self)
         self.title_edit = QLineEdit()
@@ -26,6 +34,12 @@ class NewNoteWidget(QWidget):
         self.image_list.setIconSize(QSize(100, 100))
         self.btn_add_images = QPushButton("Add Images")
         self.btn_share_note = QPushButton("Share Note")
+        self.btn_batch_share = QPushButton("Batch Share")
+        batch_menu = QMenu(self.btn_batch_share)
+        batch_menu.addAction("From Folder...", self.batch_share_folder)
+        batch_menu.addAction("From Export File...", self.batch_share_file)
+        self.btn_batch_share.setMenu(batch_menu)
+        self.batch_job = None
         self.url_label = QLabel("")
         self.btn_copy_url = QPushButton("Copy URL")
         self.url_label.hide()
@@ -36,6 +50,7 @@ class NewNoteWidget(QWidget):
         hl = QHBoxLayout()
         hl.addWidget(self.btn_add_images)
         hl.addWidget(self.btn_share_note)
+        hl.addWidget(self.btn_batch_share)
         layout.addLayout(hl)
         url_layout = QHBoxLayout()
         url_layout.addWidget(self.url_label)
@@ -52,84 +67,164 @@ class NewNoteWidget(QWidget):
                 if len(self.selected_images) >= 5:
                     break
                 if f not in self.selected_images:
-                    self.selected_images.append(f)
-                    item = QListWidgetItem(os.path.basename(f))
-                    pix = QPixmap(f)
-                    if not pix.isNull():
-                        item.setIcon(QIcon(pix.scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)))
-                    self.image_list.addItem(item)
+                    self.add_image(f)
+    def add_image(self, f):
+        self.selected_images.append(f)
+        item = QListWidgetItem(os.path.basename(f))
+        item.setData(Qt.UserRole, f)
+        self.image_list.addItem(item)
+        get_thumbnail_service().request(f, 100, lambda pix: self.set_image_icon(f, pix))
+        self.autosave.schedule()
+    def set_image_icon(self, f, pix):
+        if sip.isdeleted(self) or pix.isNull():
+            return
+        for row in range(self.image_list.count()):
+            item = self.image_list.item(row)
+            if item.data(Qt.UserRole) == f:
+                item.setIcon(QIcon(pix))
     def share_note(self):
-        data_file = load_data_sync()
         title = self.title_edit.text().strip()
         content = self.note_edit.toPlainText().strip()
         if not title or not content:
             QMessageBox.warning(self, "Error", "Title and Content cannot be empty!")
             return
-        for n in data_file["notes"]:
-            if n.get("title", "").strip() == title:
-                res = QMessageBox.question(self, "Duplicate Note", "A note with the same title exists. Continue?", QMessageBox.Yes|QMessageBox.No)
-                if res == QMessageBox.No:
-                    return
-                break
+        if repository.find_by_title(title):
+            res = QMessageBox.question(self, "Duplicate Note", "A note with the same title exists. Continue?", QMessageBox.Yes|QMessageBox.No)
+            if res == QMessageBox.No:
+                return
         payload = {"title": title, "content": content}
+        images = list(self.selected_images)
+        get_upload_executor().submit(payload, images, lambda link, local: self.on_share_finished(title, content, local, link), lambda err_title, message, retryable, local: self.on_share_error(title, content, images, local, err_title, message, retryable))
+        self.reset_form(True)
+        self.autosave.discard()
+    def on_share_finished(self, title, content, local, link):
+        self.save_to_local(title, content, local, link)
+        QApplication.instance().tray_icon.showMessage("Note Shared", f"Note '{title}' has been shared.\nLink: {link}", QApplication.instance().tray_icon.Information, 5000)
+        if sip.isdeleted(self):
+            return
+        self.note_url = link
+        QMessageBox.information(self, "Success", "Note shared!\nLink: " + link)
+        self.url_label.setText(link)
+        self.url_label.show()
+        self.btn_copy_url.show()
+        self.notes_update_callback()
+    def on_share_error(self, title, content, images, local, err_title, message, retryable):
+        if retryable:
+            self.queue_pending(title, content, local)
+            return
+        if sip.isdeleted(self):
+            QApplication.instance().tray_icon.showMessage(err_title, message, QApplication.instance().tray_icon.Warning, 5000)
+            return
+        QMessageBox.warning(self, err_title, message)
+        if not self.title_edit.text() and not self.note_edit.toPlainText() and not self.selected_images:
+            self.title_edit.setText(title)
+            self.note_edit.setPlainText(content)
+            for f in images:
+                self.add_image(f)
+    def queue_pending(self, title, content, local):
+        sync = get_outbox_sync()
+        if sync.outbox.find_duplicate(title, content, local["images"]) is None:
+            note_id = self.save_to_local(title, content, local, None, status=PENDING)
+            if note_id is not None:
+                sync.enqueue(note_id)
+        QApplication.instance().tray_icon.showMessage("Note Saved Offline", f"Note '{title}' could not be shared and was saved to the outbox.\nIt will be shared when the connection returns.", QApplication.instance().tray_icon.Warning, 5000)
+    def batch_share_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder of Notes")
+        if not folder:
+            return
+        self.batch_share(lambda: drafts_from_folder(folder))
+    def batch_share_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Export File", "", "NoteToLink Export (*.zip *.ndjson *.jsonl);;All Files (*)")
+        if not path:
+            return
+        self.batch_share(lambda: drafts_from_notes(read_notes(path)))
+    def batch_share(self, load_drafts):
+        dialog = QProgressDialog("Reading notes...", "Cancel", 0, 0, self)
+        dialog.setMinimumDuration(0)
+        job = BatchPublishJob(load_drafts, parent=self)
+        def on_progress(done, total, failed):
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+            dialog.setLabelText("Shared %d of %d notes (%d failed)" % (done - failed, total, failed))
+        job.progress.connect(on_progress)
+        job.finished.connect(lambda results, notes: self.on_batch_finished(job, dialog, results, notes))
+        job.failed.connect(lambda message: self.on_batch_failed(job, dialog, message))
+        dialog.canceled.connect(job.cancel)
+        self.btn_batch_share.setEnabled(False)
+        self.batch_job = job
+        job.start()
+    def end_batch(self, job, dialog):
+        dialog.close()
+        job.deleteLater()
+        self.batch_job = None
+        self.btn_batch_share.setEnabled(True)
+    def on_batch_failed(self, job, dialog, message):
+        self.end_batch(job, dialog)
+        QMessageBox.warning(self, "Error", message)
+    def on_batch_finished(self, job, dialog, results, notes):
         try:
-            resp = send_note_api(payload, self.selected_images)
+            repository.save_notes(notes)
         except Exception as e:
-            QMessageBox.warning(self, "Error", str(e))
+            QMessageBox.warning(self, "Error", "Failed to save data: " + str(e))
+        self.end_batch(job, dialog)
+        if not results:
+            QMessageBox.information(self, "Batch Share", "No notes found to share.")
             return
-        if resp.status_code == 200:
-            try:
-                js = resp.json()
-            except Exception:
-                QMessageBox.warning(self, "Error", "JSON parse error.")
-                return
-            if js.get("success"):
-                link = js.get("link", "Unknown")
-                self.note_url = link
-                QMessageBox.information(self, "Success", "Note shared!\nLink: " + link)
-                QApplication.instance().tray_icon.showMessage("Note Shared", f"Note '{title}' has been shared.\nLink: {link}", QApplication.instance().tray_icon.Information, 5000)
-                self.url_label.setText(link)
-                self.url_label.show()
-                self.btn_copy_url.show()
-                self.save_to_local(title, content, self.selected_images, link)
-                self.notes_update_callback()
-                self.reset_form(True)
-            else:
-                QMessageBox.warning(self, "API Error", "Could not share note: " + js.get("error", "Unknown API error"))
-        else:
-            QMessageBox.warning(self, "HTTP Error", "Status: " + str(resp.status_code) + "\n" + resp.text)
+        shared = sum(1 for _, link, _ in results if link is not None)
+        queued = sum(1 for n in notes if n.get("status") == PENDING)
+        failed = sum(1 for n in notes if n.get("status") and n.get("status") != PENDING)
+        if queued:
+            get_outbox_sync().drain()
+        QMessageBox.information(self, "Batch Share", "Shared %d of %d notes.\n%d queued in the outbox, %d failed." % (shared, len(results), queued, failed))
+        if shared:
+            self.notes_update_callback()
     def copy_url(self):
         if self.note_url:
             QApplication.clipboard().setText(self.note_url)
             QMessageBox.information(self, "Copied", "Note URL copied to clipboard.")
-    def save_to_local(self, title, content, images, link, note_id=None, category_id=None, favorite=False):
-        d = load_data_sync()
+    def save_to_local(self, title, content, local, link, note_id=None, category_id=None, favorite=False, status=None):
         timestamp = datetime.now().isoformat()
-        if note_id is None:
-            note_id = str(uuid.uuid4())
-            d["notes"].append({
-                "id": note_id,
-                "title": title,
-                "note_text": content,
-                "images": images,
-                "link": link,
-                "timestamp": timestamp,
-                "category_id": category_id,
-                "favorite": favorite
-            })
-        else:
-            for note in d["notes"]:
-                if note["id"] == note_id:
-                    note["title"] = title
-                    note["note_text"] = content
-                    note["images"] = images
-                    note["link"] = link
-                    note["timestamp"] = timestamp
-                    break
+        images, hashes = local["images"], local["hashes"]
         try:
-            save_data_sync(d)
+            if note_id is None:
+                note_id = str(uuid.uuid4())
+                note = {
+                    "id": note_id,
+                    "title": title,
+                    "note_text": content,
+                    "images": images,
+                    "link": link,
+                    "timestamp": timestamp,
+                    "category_id": category_id,
+                    "favorite": favorite,
+                    "hashes": hashes
+                }
+                if status:
+                    note["status"] = status
+                repository.save_note(note)
+            else:
+                fields = {"title": title, "note_text": content, "images": images, "link": link, "timestamp": timestamp, "hashes": hashes}
+                if status or (repository.get(note_id) or {}).get("status"):
+                    fields["status"] = status
+                repository.update_note(note_id, **fields)
         except Exception as e:
-            QMessageBox.warning(self, "Error", "Failed to save data: " + str(e))
+            QMessageBox.warning(None if sip.isdeleted(self) else self, "Error", "Failed to save data: " + str(e))
+            return None
+        return note_id
+    def draft_fields(self):
+        return {"title": self.title_edit.text(), "content": self.note_edit.toPlainText(), "images": list(self.selected_images)}
+    def restore_draft(self):
+        draft = self.autosave.restore()
+        if draft is None:
+            return False
+        self.title_edit.setText(draft.get("title", ""))
+        self.note_edit.setPlainText(draft.get("content", ""))
+        self.image_list.clear()
+        self.selected_images = []
+        for f in draft.get("images", [])[:5]:
+            self.add_image(f)
+        self.autosave.cancel()
+        return True
     def reset_form(self, keep_url=False):
         self.title_edit.clear()
         self.note_edit.clear()
@@ -1,74 +1,167 @@
 import os
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QScrollArea, QApplication
+from collections import OrderedDict
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QScrollArea, QApplication, QShortcut
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from core.data import load_data_sync, save_data_sync
+from PyQt5.QtGui import QKeySequence
+from core.repository import repository
+from ui.workers import get_outbox_sync
+from ui.thumbnails import get_thumbnail_service
+
+DETAIL_THUMBNAIL_SIZE = 150
+RENDERED_NOTES = 32
 
 class NoteDetailWidget(QWidget):
-    def __init__(self, note, back_callback, edit_callback):
+    def __init__(self, note, back_callback, edit_callback, page_callback=None):
         super().__init__()
-        self.note = note
+        self.note = None
         self.back_callback = back_callback
         self.edit_callback = edit_callback
+        self.page_callback = page_callback
+        self.rendered = OrderedDict()
+        self.generation = 0
+        self.image_labels = []
+        self.setFocusPolicy(Qt.StrongFocus)
         self.init_ui()
+        repository.subscribe(self.on_repository_changed)
+        if note is not None:
+            self.set_note(note)
     def init_ui(self):
         layout = QVBoxLayout(self)
-        layout.addWidget(QLabel("Title: " + self.note.get("title", "Untitled")))
-        content_label = QLabel(self.note.get("note_text", ""))
-        content_label.setWordWrap(True)
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
+        self.title_label = QLabel()
+        layout.addWidget(self.title_label)
+        self.content_label = QLabel()
+        self.content_label.setWordWrap(True)
+        self.scroll = QScrollArea()
+        self.scroll.setWidgetResizable(True)
         content_container = QWidget()
         content_layout = QVBoxLayout(content_container)
-        content_layout.addWidget(content_label)
-        scroll.setWidget(content_container)
-        layout.addWidget(scroll)
-        images = self.note.get("images", [])
-        if images:
-            hl = QHBoxLayout()
-            for i in images:
-                pix = QPixmap(i) if os.path.exists(i) else QPixmap()
-                if not pix.isNull():
-                    thumb = pix.scaled(150, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    lbl = QLabel()
-                    lbl.setPixmap(thumb)
-                    hl.addWidget(lbl)
-            layout.addLayout(hl)
-        link = self.note.get("link", "")
-        if link:
-            link_layout = QHBoxLayout()
-            link_layout.addWidget(QLabel("Link:"))
-            self.link_label = QLabel(link)
-            link_layout.addWidget(self.link_label)
-            btn_copy = QPushButton("Copy Link")
-            btn_copy.clicked.connect(self.copy_link)
-            link_layout.addWidget(btn_copy)
-            layout.addLayout(link_layout)
+        content_layout.addWidget(self.content_label)
+        self.scroll.setWidget(content_container)
+        layout.addWidget(self.scroll)
+        self.image_row = QWidget()
+        self.image_layout = QHBoxLayout(self.image_row)
+        layout.addWidget(self.image_row)
+        self.status_row = QWidget()
+        status_layout = QHBoxLayout(self.status_row)
+        self.status_label = QLabel()
+        status_layout.addWidget(self.status_label)
+        btn_retry = QPushButton("Retry Share")
+        btn_retry.clicked.connect(self.retry_share)
+        status_layout.addWidget(btn_retry)
+        layout.addWidget(self.status_row)
+        self.link_row = QWidget()
+        link_layout = QHBoxLayout(self.link_row)
+        link_layout.addWidget(QLabel("Link:"))
+        self.link_label = QLabel()
+        link_layout.addWidget(self.link_label)
+        btn_copy = QPushButton("Copy Link")
+        btn_copy.clicked.connect(self.copy_link)
+        link_layout.addWidget(btn_copy)
+        layout.addWidget(self.link_row)
         btn_layout = QHBoxLayout()
         btn_delete = QPushButton("Delete Note")
         btn_edit = QPushButton("Edit Note")
-        btn_toggle = QPushButton()
-        self.update_fav_button_text(btn_toggle)
+        self.btn_toggle = QPushButton()
         btn_back = QPushButton("Back")
         btn_layout.addWidget(btn_delete)
         btn_layout.addWidget(btn_edit)
-        btn_layout.addWidget(btn_toggle)
+        btn_layout.addWidget(self.btn_toggle)
         btn_layout.addWidget(btn_back)
         layout.addLayout(btn_layout)
         btn_delete.clicked.connect(self.delete_note)
         btn_edit.clicked.connect(lambda: self.edit_callback(self.note))
-        btn_toggle.clicked.connect(lambda: self.toggle_favorite(btn_toggle))
+        self.btn_toggle.clicked.connect(lambda: self.toggle_favorite(self.btn_toggle))
         btn_back.clicked.connect(self.back_callback)
+        for key, step in ((Qt.Key_Left, -1), (Qt.Key_Right, 1)):
+            shortcut = QShortcut(QKeySequence(key), self)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(lambda step=step: self.page(step))
+    def page(self, step):
+        if self.page_callback is not None and self.note is not None:
+            self.page_callback(self.note["id"], step)
+    def set_note(self, note):
+        if self.note is not None:
+            self.remember_state()
+        self.note = note
+        self.generation += 1
+        state = self.rendered.pop(note["id"], None)
+        if state is None or state["images"] != list(note.get("images", [])):
+            state = {"images": list(note.get("images", [])), "pixmaps": {}, "scroll": 0}
+        self.rendered[note["id"]] = state
+        while len(self.rendered) > RENDERED_NOTES:
+            self.rendered.popitem(last=False)
+        self.title_label.setText("Title: " + note.get("title", "Untitled"))
+        self.content_label.setText(note.get("note_text", ""))
+        self.show_images(state)
+        self.update_status()
+        self.update_fav_button_text(self.btn_toggle)
+        self.scroll.verticalScrollBar().setValue(state["scroll"])
+    def remember_state(self):
+        state = self.rendered.get(self.note["id"])
+        if state is not None:
+            state["scroll"] = self.scroll.verticalScrollBar().value()
+    def show_images(self, state):
+        paths = [p for p in state["images"] if os.path.exists(p)]
+        while len(self.image_labels) < len(paths):
+            lbl = QLabel()
+            lbl.setMinimumSize(DETAIL_THUMBNAIL_SIZE, DETAIL_THUMBNAIL_SIZE)
+            lbl.setAlignment(Qt.AlignCenter)
+            self.image_layout.addWidget(lbl)
+            self.image_labels.append(lbl)
+        for lbl in self.image_labels[len(paths):]:
+            lbl.hide()
+        generation = self.generation
+        for lbl, path in zip(self.image_labels, paths):
+            lbl.clear()
+            lbl.show()
+            pix = state["pixmaps"].get(path)
+            if pix is not None:
+                lbl.setPixmap(pix)
+                continue
+            lbl.setText("Loading...")
+            get_thumbnail_service().request(path, DETAIL_THUMBNAIL_SIZE, lambda pix, lbl=lbl, path=path: self.on_thumbnail(generation, state, lbl, path, pix))
+        self.image_row.setVisible(bool(paths))
+    def on_thumbnail(self, generation, state, lbl, path, pix):
+        if not pix.isNull():
+            state["pixmaps"][path] = pix
+        if generation != self.generation:
+            return
+        if pix.isNull():
+            lbl.hide()
+        else:
+            lbl.setPixmap(pix)
+    def update_status(self):
+        if self.note.get("status"):
+            status_text = "Status: " + self.note["status"]
+            if self.note.get("error"):
+                status_text += " (" + self.note["error"] + ")"
+            self.status_label.setText(status_text)
+            self.status_row.show()
+        else:
+            self.status_row.hide()
+        link = self.note.get("link", "")
+        self.link_label.setText(link or "")
+        self.link_row.setVisible(bool(link))
+    def on_repository_changed(self, change):
+        if self.note is None:
+            return
+        nid = self.note["id"]
+        if nid in change.removed:
+            self.rendered.pop(nid, None)
+        elif nid in change.notes:
+            note = repository.get(nid)
+            if note is not None:
+                self.set_note(note)
     def copy_link(self):
         if self.note.get("link"):
             QApplication.clipboard().setText(self.note["link"])
             QMessageBox.information(self, "Copied", "Note link copied to clipboard.")
+    def retry_share(self):
+        get_outbox_sync().enqueue(self.note["id"])
+        QMessageBox.information(self, "Outbox", "The note will be shared in the background.")
     def delete_note(self):
-        d = load_data_sync()
-        nid = self.note.get("id")
-        d["notes"] = [x for x in d["notes"] if x.get("id") != nid]
         try:
-            save_data_sync(d)
+            repository.delete_note(self.note.get("id"))
         except Exception as e:
             QMessageBox.warning(self, "Error", str(e))
             return
@@ -76,18 +169,13 @@ class NoteDetailWidget(QWidget):
         QApplication.instance().tray_icon.showMessage("Note Deleted", "The note has been successfully deleted.", QApplication.instance().tray_icon.Information, 5000)
         self.back_callback()
     def toggle_favorite(self, btn):
-        d = load_data_sync()
-        nid = self.note.get("id")
-        for note in d["notes"]:
-            if note.get("id") == nid:
-                note["favorite"] = not note.get("favorite", False)
-                self.note["favorite"] = note["favorite"]
-                break
         try:
-            save_data_sync(d)
+            note = repository.update_note(self.note.get("id"), favorite=not self.note.get("favorite", False))
         except Exception as e:
             QMessageBox.warning(self, "Error", str(e))
             return
+        if note is not None:
+            self.note = note
         self.update_fav_button_text(btn)
         QMessageBox.information(self, "Updated", "Favorite status updated.")
     def update_fav_button_text(self, btn):
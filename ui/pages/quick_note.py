@@ -1,16 +1,27 @@
+import time
 import uuid
 from datetime import datetime
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QTextEdit, QMessageBox, QApplication
-from PyQt5.QtCore import Qt
-from core.data import load_data_sync, save_data_sync
-from core.api import send_note_api
+from PyQt5.QtCore import Qt, QEvent
+from core.repository import repository
+from core.digests import note_hashes
+from core.metrics import metrics
+from ui.workers import get_outbox_sync, DraftAutosave
+from core.outbox import PENDING
 
 class QuickNoteDialog(QDialog):
     def __init__(self, notes_update_callback):
         super().__init__()
         self.notes_update_callback = notes_update_callback
         self.note_url = None
+        self.opened_at = None
         self.init_ui()
+        self.autosave = DraftAutosave("quick", self.draft_fields, [self.title_edit, self.note_edit], self)
+        draft = self.autosave.restore()
+        if draft is not None:
+            self.title_edit.setText(draft.get("title", ""))
+            self.note_edit.setPlainText(draft.get("content", ""))
+            self.autosave.cancel()
     def init_ui(self):
         self.setWindowTitle("Quick Note")
         layout = QVBoxLayout(self)
@@ -32,55 +43,87 @@ class QuickNoteDialog(QDialog):
         layout.addLayout(url_layout)
         self.btn_share.clicked.connect(self.share_note)
         self.btn_copy_url.clicked.connect(self.copy_url)
+        self.title_edit.installEventFilter(self)
+        self.note_edit.installEventFilter(self)
+    def prewarm(self):
+        self.ensurePolished()
+        self.adjustSize()
+        self.winId()
+    def open_note(self, clicked_at=None):
+        self.opened_at = clicked_at or time.perf_counter()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.title_edit.setFocus()
+        metrics.record("quick_note.open", time.perf_counter() - self.opened_at)
+    def eventFilter(self, obj, event):
+        if self.opened_at is not None and event.type() == QEvent.KeyPress:
+            metrics.record("quick_note.first_keystroke", time.perf_counter() - self.opened_at)
+            self.opened_at = None
+        return super().eventFilter(obj, event)
     def share_note(self):
+        started = time.perf_counter()
         title = self.title_edit.text().strip()
         content = self.note_edit.toPlainText().strip()
         if not title or not content:
             QMessageBox.warning(self, "Error", "Title and Content cannot be empty!")
             return
-        payload = {"title": title, "content": content}
+        sync = get_outbox_sync()
+        duplicate = sync.outbox.find_duplicate(title, content, [])
+        if duplicate is not None:
+            sync.enqueue(duplicate["id"])
+        else:
+            nid = self.save_to_local(title, content, None, status=PENDING)
+            if nid is None:
+                return
+            sync.outbox.started(nid)
+            sync.executor.submit({"title": title, "content": content}, [], lambda link, local: self.on_share_finished(nid, title, link), lambda err_title, message, retryable, local: self.on_share_error(nid, title, err_title, message, retryable))
+        self.title_edit.clear()
+        self.note_edit.clear()
+        self.autosave.discard()
+        self.hide()
+        metrics.record("quick_note.share_to_dismiss", time.perf_counter() - started)
+    def draft_fields(self):
+        return {"title": self.title_edit.text(), "content": self.note_edit.toPlainText(), "images": []}
+    def save_to_local(self, title, content, link, status=None):
+        nid = str(uuid.uuid4())
+        note = {
+            "id": nid,
+            "title": title,
+            "note_text": content,
+            "images": [],
+            "link": link,
+            "timestamp": datetime.now().isoformat(),
+            "category_id": None,
+            "favorite": False,
+            "hashes": note_hashes(title, content, [])
+        }
+        if status:
+            note["status"] = status
         try:
-            resp = send_note_api(payload, [])
+            repository.save_note(note)
         except Exception as e:
-            QMessageBox.warning(self, "Network Error", str(e))
+            QMessageBox.warning(self, "Error", "Failed to save data: " + str(e))
+            return None
+        return nid
+    def on_share_finished(self, note_id, title, link):
+        get_outbox_sync().outbox.succeeded(note_id, link)
+        QApplication.instance().tray_icon.showMessage("Note Shared", f"Quick Note '{title}' has been shared.\nLink: {link}", QApplication.instance().tray_icon.Information, 5000)
+        self.note_url = link
+        if self.isVisible():
+            QMessageBox.information(self, "Success", "Note shared!\nLink: " + link)
+        self.url_label.setText(link)
+        self.url_label.show()
+        self.btn_copy_url.show()
+        self.notes_update_callback()
+    def on_share_error(self, note_id, title, err_title, message, retryable):
+        sync = get_outbox_sync()
+        sync.outbox.failed(note_id, retryable, message)
+        if retryable:
+            sync.schedule()
+            QApplication.instance().tray_icon.showMessage("Note Saved Offline", f"Quick Note '{title}' could not be shared and was saved to the outbox.\nIt will be shared when the connection returns.", QApplication.instance().tray_icon.Warning, 5000)
             return
-        if resp.status_code == 200:
-            try:
-                js = resp.json()
-            except Exception:
-                QMessageBox.warning(self, "Error", "JSON parse error.")
-                return
-            if js.get("success"):
-                link = js.get("link", "Unknown")
-                self.note_url = link
-                QMessageBox.information(self, "Success", "Note shared!\nLink: " + link)
-                QApplication.instance().tray_icon.showMessage("Note Shared", f"Quick Note '{title}' has been shared.\nLink: {link}", QApplication.instance().tray_icon.Information, 5000)
-                self.url_label.setText(link)
-                self.url_label.show()
-                self.btn_copy_url.show()
-                ddata = load_data_sync()
-                nid = str(uuid.uuid4())
-                ddata["notes"].append({
-                    "id": nid,
-                    "title": title,
-                    "note_text": content,
-                    "images": [],
-                    "link": link,
-                    "timestamp": datetime.now().isoformat(),
-                    "category_id": None,
-                    "favorite": False
-                })
-                try:
-                    save_data_sync(ddata)
-                except Exception as e:
-                    QMessageBox.warning(self, "Error", "Failed to save data: " + str(e))
-                self.notes_update_callback()
-                self.title_edit.clear()
-                self.note_edit.clear()
-            else:
-                QMessageBox.warning(self, "API Error", "Could not share note: " + js.get("error", "Unknown API error"))
-        else:
-            QMessageBox.warning(self, "HTTP Error", "Status: " + str(resp.status_code) + "\n" + resp.text)
+        QMessageBox.warning(self, err_title, message + "\nThe note was kept in My Notes as failed.")
     def copy_url(self):
         if self.note_url:
             QApplication.clipboard().setText(self.note_url)
@@ -1,5 +1,7 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QCheckBox
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QPushButton, QFileDialog, QProgressDialog, QMessageBox
 from PyQt5.QtCore import Qt
+from ui.workers import TransferJob
+from core.transfer import export_notes, import_notes
 
 class SettingsWidget(QWidget):
     def __init__(self, theme_change_callback, current_theme="dark"):
@@ -14,8 +16,62 @@ class SettingsWidget(QWidget):
         self.chk_dark_mode.setChecked(self.current_theme == "dark")
         layout.addWidget(lbl)
         layout.addWidget(self.chk_dark_mode)
+        transfer_layout = QHBoxLayout()
+        self.btn_import = QPushButton("Import Notes...")
+        self.btn_export = QPushButton("Export Notes...")
+        transfer_layout.addWidget(self.btn_import)
+        transfer_layout.addWidget(self.btn_export)
+        layout.addLayout(transfer_layout)
         layout.addStretch()
         self.chk_dark_mode.stateChanged.connect(self.on_theme_toggled)
+        self.btn_import.clicked.connect(self.import_notes)
+        self.btn_export.clicked.connect(self.export_notes)
     def on_theme_toggled(self, state):
         self.current_theme = "dark" if state == Qt.Checked else "light"
         self.theme_change_callback(self.current_theme)
+    def import_notes(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Notes", "", "NoteToLink Export (*.zip *.ndjson *.jsonl);;All Files (*)")
+        if not path:
+            return
+        def finished(stats):
+            QMessageBox.information(self, "Import Finished", "Imported %d notes and %d categories.\nSkipped %d duplicates and %d invalid records." % (stats["added"], stats["categories"], stats["duplicates"], stats["invalid"]))
+        self.run_transfer("Importing notes...", lambda repo: import_notes(path, repo), lambda stats: (stats["done"], stats["total"]), finished)
+    def export_notes(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Notes", "notes.zip", "Bundle with Images (*.zip);;NDJSON (*.ndjson)")
+        if not path:
+            return
+        def finished(progress):
+            QMessageBox.information(self, "Export Finished", "Exported %d notes to %s." % (progress[1], path))
+        self.run_transfer("Exporting notes...", lambda repo: export_notes(path, repo), lambda progress: progress, finished)
+    def run_transfer(self, label, make_steps, progress_of, finished):
+        dialog = QProgressDialog(label, "Cancel", 0, 1000, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(300)
+        job = TransferJob(make_steps, parent=self)
+        state = {"done": False}
+        def stop():
+            if state["done"]:
+                return False
+            state["done"] = True
+            job.cancel()
+            dialog.close()
+            self.btn_import.setEnabled(True)
+            self.btn_export.setEnabled(True)
+            return True
+        def on_progress(last):
+            if not state["done"]:
+                done, total = progress_of(last)
+                dialog.setValue(int(1000 * done / total) if total else 0)
+        def on_finished(last):
+            if stop():
+                finished(last)
+        def on_failed(message):
+            if stop():
+                QMessageBox.warning(self, "Error", message)
+        job.progress.connect(on_progress)
+        job.finished.connect(on_finished)
+        job.failed.connect(on_failed)
+        dialog.canceled.connect(stop)
+        self.btn_import.setEnabled(False)
+        self.btn_export.setEnabled(False)
+        job.start()
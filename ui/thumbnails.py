@@ -0,0 +1,109 @@
+import os
+import hashlib
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QBuffer, QIODevice, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+from core.metrics import metrics
+from core.diskcache import DiskCache
+
+THUMBNAIL_CACHE_DIR = "thumbnail_cache"
+THUMBNAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+MEMORY_CACHE_ENTRIES = 256
+MAX_DECODERS = 4
+
+def cache_key(path, size):
+    st = os.stat(path)
+    raw = "%s|%d|%d|%d" % (os.path.abspath(path), st.st_mtime_ns, st.st_size, size)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class ThumbnailCache(DiskCache):
+    def __init__(self, directory=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+        super().__init__(directory, max_bytes, ".png")
+    def get(self, key):
+        data = super().get(key)
+        if data is None:
+            return None
+        img = QImage.fromData(data, "PNG")
+        return None if img.isNull() else img
+    def put(self, key, img):
+        buf = QBuffer()
+        buf.open(QIODevice.WriteOnly)
+        if img.save(buf, "PNG"):
+            super().put(key, bytes(buf.data()))
+
+@metrics.timed("thumbnail.decode")
+def decode_thumbnail(path, size):
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    full = reader.size()
+    if full.isValid() and (full.width() > size or full.height() > size):
+        reader.setScaledSize(full.scaled(size, size, Qt.KeepAspectRatio))
+    img = reader.read()
+    if not img.isNull() and (img.width() > size or img.height() > size):
+        img = img.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return img
+
+class ThumbnailSignals(QObject):
+    ready = pyqtSignal(str, int, QImage)
+
+class ThumbnailJob(QRunnable):
+    def __init__(self, path, size, cache, signals):
+        super().__init__()
+        self.path = path
+        self.size = size
+        self.cache = cache
+        self.signals = signals
+    def run(self):
+        img = QImage()
+        try:
+            key = cache_key(self.path, self.size)
+            img = self.cache.get(key)
+            metrics.count("thumbnail.cache_hits" if img is not None else "thumbnail.cache_misses")
+            if img is None:
+                img = decode_thumbnail(self.path, self.size)
+                if not img.isNull():
+                    self.cache.put(key, img)
+        except Exception:
+            img = QImage()
+        self.signals.ready.emit(self.path, self.size, img)
+
+class ThumbnailService(QObject):
+    def __init__(self, cache=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache or ThumbnailCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_DECODERS)
+        self.signals = ThumbnailSignals(self)
+        self.signals.ready.connect(self.on_ready)
+        self.memory = OrderedDict()
+        self.waiting = {}
+    def request(self, path, size, callback):
+        key = (path, size)
+        pix = self.memory.get(key)
+        if pix is not None:
+            self.memory.move_to_end(key)
+            callback(pix)
+            return
+        callbacks = self.waiting.get(key)
+        if callbacks is not None:
+            callbacks.append(callback)
+            return
+        self.waiting[key] = [callback]
+        self.pool.start(ThumbnailJob(path, size, self.cache, self.signals))
+    def on_ready(self, path, size, img):
+        key = (path, size)
+        pix = QPixmap.fromImage(img) if not img.isNull() else QPixmap()
+        if not pix.isNull():
+            self.memory[key] = pix
+            while len(self.memory) > MEMORY_CACHE_ENTRIES:
+                self.memory.popitem(last=False)
+        for callback in self.waiting.pop(key, []):
+            callback(pix)
+
+thumbnail_service = None
+
+def get_thumbnail_service():
+    global thumbnail_service
+    if thumbnail_service is None:
+        thumbnail_service = ThumbnailService()
+    return thumbnail_service
@@ -1,31 +1,151 @@
 import os
-from PyQt5.QtWidgets import QListWidget, QListWidgetItem
-from PyQt5.QtCore import Qt, QMimeData
+from bisect import bisect_left
+from PyQt5.QtWidgets import QListWidget, QListWidgetItem, QListView
+from PyQt5.QtCore import Qt, QMimeData, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QIcon, QPixmap
+from core.metrics import metrics
+from core.repository import NoteView
 
-class NoteListWidget(QListWidget):
+FETCH_BATCH_SIZE = 200
+
+class NoteListModel(QAbstractListModel):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setDragEnabled(True)
-        self.setDefaultDropAction(Qt.MoveAction)
-        self.setSelectionMode(QListWidget.SingleSelection)
-        self.setDragDropMode(QListWidget.DragDrop)
-        self.setDropIndicatorShown(True)
-    def mimeData(self, items):
+        self.notes = []
+        self.loaded = 0
+    @metrics.timed("list.refresh")
+    def set_notes(self, notes, depth=0):
+        self.beginResetModel()
+        self.notes = NoteView(notes.repo, list(notes.seqs)) if type(notes) is NoteView else notes
+        self.loaded = min(len(notes), max(FETCH_BATCH_SIZE, depth))
+        self.endResetModel()
+    @metrics.timed("list.update")
+    def update_notes(self, notes, changed, removed):
+        if type(self.notes) is not NoteView or type(notes) is not NoteView or len(changed) + len(removed) > FETCH_BATCH_SIZE:
+            return False
+        repo = notes.repo
+        old, new = self.notes.seqs, notes.seqs
+        gone, added, touched = set(), [], []
+        for nid in changed:
+            seq = repo.seq.get(nid)
+            if seq is None:
+                continue
+            was, now = contains(old, seq), contains(new, seq)
+            if was and not now:
+                gone.add(seq)
+            elif now and not was:
+                added.append(seq)
+            elif was:
+                touched.append(seq)
+        if removed:
+            gone.update(seq for seq in old if seq not in repo.order)
+        for seq in sorted(gone):
+            i = bisect_left(old, seq)
+            row = len(old) - 1 - i
+            if row < self.loaded:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del old[i]
+                self.loaded -= 1
+                self.endRemoveRows()
+            else:
+                del old[i]
+        for seq in sorted(added):
+            i = bisect_left(old, seq)
+            row = len(old) - i
+            if row < self.loaded or self.loaded >= len(old):
+                self.beginInsertRows(QModelIndex(), row, row)
+                old.insert(i, seq)
+                self.loaded += 1
+                self.endInsertRows()
+            else:
+                old.insert(i, seq)
+        for seq in touched:
+            row = len(old) - 1 - bisect_left(old, seq)
+            if row < self.loaded:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+        return True
+    def note_at(self, row):
+        if 0 <= row < min(self.loaded, len(self.notes)):
+            return self.notes[row]
+        return None
+    def row_of(self, note_id, hint=-1):
+        if self.note_at(hint) is not None and self.notes[hint]["id"] == note_id:
+            return hint
+        for row in range(min(self.loaded, len(self.notes))):
+            if self.notes[row]["id"] == note_id:
+                return row
+        return -1
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return min(self.loaded, len(self.notes))
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.notes)
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_BATCH_SIZE, len(self.notes) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+    def data(self, index, role=Qt.DisplayRole):
+        n = self.note_at(index.row()) if index.isValid() else None
+        if n is None:
+            return None
+        if role == Qt.DisplayRole:
+            if n.get("status"):
+                return n["title"] + " - " + n["timestamp"] + " (" + n["status"] + ")"
+            return n["title"] + " - " + n["timestamp"]
+        if role == Qt.UserRole:
+            return n["id"]
+        return None
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+    def supportedDragActions(self):
+        return Qt.MoveAction | Qt.CopyAction
+    def mimeTypes(self):
+        return ["text/plain"]
+    def mimeData(self, indexes):
         md = QMimeData()
-        if items:
-            md.setText(items[0].data(Qt.UserRole))
+        if indexes:
+            md.setText(indexes[0].data(Qt.UserRole) or "")
         return md
-    def dragEnterEvent(self, e):
-        if e.mimeData().hasText():
-            e.acceptProposedAction()
-    def dragMoveEvent(self, e):
-        if e.mimeData().hasText():
-            e.acceptProposedAction()
-    def dropEvent(self, e):
-        if e.mimeData().hasText():
-            e.acceptProposedAction()
-            super().dropEvent(e)
+
+def contains(seqs, seq):
+    i = bisect_left(seqs, seq)
+    return i < len(seqs) and seqs[i] == seq
+
+class NoteListWidget(QListView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setModel(NoteListModel(self))
+        self.setUniformItemSizes(True)
+        self.setDragEnabled(True)
+        self.setDefaultDropAction(Qt.MoveAction)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setDragDropMode(QListView.DragOnly)
+    def set_notes(self, notes, keep_position=False):
+        model = self.model()
+        if not keep_position:
+            model.set_notes(notes)
+            return
+        current = self.currentIndex().data(Qt.UserRole)
+        row = self.currentIndex().row()
+        scroll = self.verticalScrollBar().value()
+        model.set_notes(notes, model.loaded)
+        if current is not None:
+            row = model.row_of(current, row)
+            if row >= 0:
+                self.setCurrentIndex(model.index(row))
+        self.verticalScrollBar().setValue(scroll)
+    def update_notes(self, notes, changed, removed):
+        if not self.model().update_notes(notes, changed, removed):
+            self.set_notes(notes, True)
 
 class CategoryListWidget(QListWidget):
     def __init__(self, parent=None):
@@ -0,0 +1,430 @@
+import os
+import time
+import uuid
+import threading
+import weakref
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThread, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal, pyqtSlot
+from PyQt5 import sip
+from core.api import share_note, ShareError
+from core.data import store
+from core.drafts import draft_store
+from core.digests import note_hashes
+from core.blobs import blob_store, note_images, referenced_images
+from core.metrics import metrics
+from core.outbox import Outbox, note_payload
+from core.publisher import BatchPublisher, result_notes
+from core.repository import repository
+
+MAX_CONCURRENT_SHARES = 4
+SYNC_DELAY = 100
+DRAFT_DELAY = 500
+BLOB_MAINTENANCE_DELAY = 10000
+
+class DataWorker(QObject):
+    finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    def __init__(self):
+        super().__init__()
+        self.task = None
+    @pyqtSlot()
+    def run(self):
+        self.task()
+    def load(self):
+        try:
+            data = store.load()
+            self.finished.emit(data)
+        except Exception as e:
+            self.error.emit(str(e))
+    def save(self, data):
+        try:
+            store.save(data)
+            self.finished.emit(data)
+        except Exception as e:
+            self.error.emit(str(e))
+
+active_workers = set()
+
+def run_data_worker(fn, callback, error_callback, *args, **kwargs):
+    thread = QThread()
+    worker = DataWorker()
+    worker.task = lambda: fn(worker, *args, **kwargs)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(callback)
+    worker.error.connect(error_callback)
+    worker.finished.connect(thread.quit)
+    worker.error.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    job = (thread, worker)
+    active_workers.add(job)
+    thread.finished.connect(lambda: active_workers.discard(job))
+    thread.start()
+
+class ShareSignals(QObject):
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(str, str, object)
+    error = pyqtSignal(str, str, str, bool, object)
+
+class ShareJob(QRunnable):
+    def __init__(self, job_id, payload, images, signals):
+        super().__init__()
+        self.job_id = job_id
+        self.payload = payload
+        self.images = list(images)
+        self.signals = signals
+        self.last_percent = -1
+    def report_progress(self, sent, total):
+        percent = int(sent * 100 / total) if total else 100
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.signals.progress.emit(self.job_id, percent)
+    def run(self):
+        self.signals.progress.emit(self.job_id, 0)
+        stored = blob_store.adopt(self.images)
+        local = {"images": stored, "hashes": note_hashes(self.payload["title"], self.payload["content"], stored)}
+        try:
+            link = share_note(self.payload, self.images, progress=self.report_progress)
+        except ShareError as e:
+            self.signals.error.emit(self.job_id, e.title, e.message, e.retryable, local)
+            return
+        except Exception as e:
+            self.signals.error.emit(self.job_id, "Error", str(e), False, local)
+            return
+        self.signals.progress.emit(self.job_id, 100)
+        self.signals.finished.emit(self.job_id, link, local)
+
+class UploadExecutor(QObject):
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(str, str)
+    error = pyqtSignal(str, str, str, bool)
+    active_changed = pyqtSignal(int)
+    def __init__(self, max_concurrent=MAX_CONCURRENT_SHARES, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_concurrent)
+        self.jobs = {}
+    def submit(self, payload, images, on_finished=None, on_error=None):
+        job_id = str(uuid.uuid4())
+        signals = ShareSignals()
+        signals.progress.connect(self.progress)
+        signals.finished.connect(self.on_job_finished)
+        signals.error.connect(self.on_job_error)
+        self.jobs[job_id] = (signals, on_finished, on_error)
+        self.pool.start(ShareJob(job_id, payload, images, signals))
+        self.active_changed.emit(len(self.jobs))
+        return job_id
+    def active_count(self):
+        return len(self.jobs)
+    def on_job_finished(self, job_id, link, local):
+        signals, on_finished, _ = self.jobs.pop(job_id, (None, None, None))
+        self.active_changed.emit(len(self.jobs))
+        self.finished.emit(job_id, link)
+        if on_finished:
+            on_finished(link, local)
+        if signals:
+            signals.deleteLater()
+    def on_job_error(self, job_id, title, message, retryable, local):
+        signals, _, on_error = self.jobs.pop(job_id, (None, None, None))
+        self.active_changed.emit(len(self.jobs))
+        self.error.emit(job_id, title, message, retryable)
+        if on_error:
+            on_error(title, message, retryable, local)
+        if signals:
+            signals.deleteLater()
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+class BatchPublishJob(QObject):
+    progress = pyqtSignal(int, int, int)
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+    def __init__(self, load_drafts, publisher=None, parent=None):
+        super().__init__(parent)
+        self.load_drafts = load_drafts
+        self.drafts = []
+        self.publisher = publisher or BatchPublisher()
+        self.cancelled = threading.Event()
+        self.thread = None
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    def cancel(self):
+        self.cancelled.set()
+    def run(self):
+        try:
+            self.drafts = list(self.load_drafts())
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.progress.emit(0, len(self.drafts), 0)
+        try:
+            results = self.publisher.publish(self.drafts, self.progress.emit, self.cancelled.is_set)
+        except Exception as e:
+            results = [(draft, None, ShareError("Error", str(e), True)) for draft in self.drafts]
+        self.finished.emit(results, result_notes(results))
+
+class GuiThreadRepository:
+    def __init__(self, job, repo):
+        self.job = job
+        self.repo = repo
+    @property
+    def notes(self):
+        return self.job.invoke(lambda: list(self.repo.notes))
+    def categories(self):
+        return self.job.invoke(lambda: [dict(c) for c in self.repo.categories()])
+    def get(self, note_id):
+        return self.get_many([note_id])[0]
+    def get_many(self, note_ids):
+        return self.job.invoke(lambda: [None if n is None else n.copy() for n in self.repo.get_many(note_ids)])
+    def find_by_title(self, title):
+        return self.job.invoke(lambda: [n.copy() for n in self.repo.find_by_title(title)])
+    def save_notes(self, notes):
+        return self.job.invoke(lambda: self.repo.save_notes(notes))
+    def save_category(self, category):
+        return self.job.invoke(lambda: self.repo.save_category(category))
+
+class TransferJob(QObject):
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    call = pyqtSignal(object)
+    def __init__(self, make_steps, repo=repository, parent=None):
+        super().__init__(parent)
+        self.make_steps = make_steps
+        self.repo = repo
+        self.cancelled = threading.Event()
+        self.thread = None
+        self.call.connect(self.run_call, Qt.BlockingQueuedConnection)
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    def cancel(self):
+        self.cancelled.set()
+    def invoke(self, fn):
+        result = {}
+        def call():
+            try:
+                result["value"] = fn()
+            except Exception as e:
+                result["error"] = e
+        self.call.emit(call)
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+    def run_call(self, fn):
+        fn()
+    def run(self):
+        last = None
+        try:
+            steps = self.make_steps(GuiThreadRepository(self, self.repo))
+            try:
+                for last in steps:
+                    if self.cancelled.is_set():
+                        return
+                    self.progress.emit(last)
+            finally:
+                steps.close()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(last)
+
+class OutboxSync(QObject):
+    shared = pyqtSignal(str, str)
+    def __init__(self, executor, repo=repository, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.outbox = Outbox(repo)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.drain)
+        executor.finished.connect(self.on_any_share_finished)
+    def start(self):
+        self.drain()
+    def drain(self):
+        for note in self.outbox.due():
+            nid = note["id"]
+            self.outbox.started(nid)
+            self.executor.submit(note_payload(note), note.get("images", []), lambda link, local, nid=nid: self.on_finished(nid, link), lambda title, message, retryable, local, nid=nid: self.on_error(nid, message, retryable))
+        self.schedule()
+    def schedule(self):
+        wait = self.outbox.next_due_in()
+        if wait is None:
+            self.timer.stop()
+        else:
+            self.timer.start(int(wait * 1000) + 1)
+    def enqueue(self, note_id):
+        self.outbox.retry_now(note_id)
+        self.drain()
+    def on_finished(self, note_id, link):
+        note = self.outbox.succeeded(note_id, link)
+        if note is not None:
+            self.shared.emit(note_id, link)
+        self.drain()
+    def on_error(self, note_id, message, retryable):
+        self.outbox.failed(note_id, retryable, message)
+        self.schedule()
+    def on_any_share_finished(self, job_id, link):
+        if self.outbox.next_attempt:
+            self.outbox.connectivity_restored()
+            QTimer.singleShot(0, self.drain)
+
+class StoreWatcher(QObject):
+    polled = pyqtSignal(object, object)
+    def __init__(self, store, repo=repository):
+        super().__init__()
+        self.store = store
+        self.repo = repo
+        self.polling = False
+        self.again = False
+        self.polled.connect(self.apply)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.schedule)
+        self.watcher.directoryChanged.connect(self.schedule)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SYNC_DELAY)
+        self.timer.timeout.connect(self.sync)
+    def start(self):
+        self.watcher.addPath(os.path.dirname(os.path.abspath(self.store.path)))
+        self.watch_files()
+    def watch_files(self):
+        watched = set(self.watcher.files())
+        missing = [p for p in (os.path.abspath(self.store.path), os.path.abspath(self.store.journal_path)) if p not in watched and os.path.exists(p)]
+        if missing:
+            self.watcher.addPaths(missing)
+    def schedule(self, path=None):
+        self.timer.start()
+    def sync(self):
+        self.watch_files()
+        if not self.repo.loaded or not self.store.changed():
+            return
+        if self.polling:
+            self.again = True
+            return
+        self.polling = True
+        threading.Thread(target=self.poll, daemon=True).start()
+    def poll(self):
+        try:
+            data, entries = self.store.poll()
+        except Exception:
+            data, entries = None, []
+        self.polled.emit(data, entries)
+    def apply(self, data, entries):
+        self.polling = False
+        try:
+            self.repo.apply_poll(data, entries)
+        except Exception:
+            pass
+        if self.again:
+            self.again = False
+            self.sync()
+
+class BlobMaintenance(QObject):
+    finished = pyqtSignal(object, int, int)
+    def __init__(self, repo=repository, parent=None):
+        super().__init__(parent)
+        self.repo = repo
+        self.thread = None
+        self.finished.connect(self.apply)
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        notes = note_images(self.repo.notes.values())
+        self.thread = threading.Thread(target=self.run, args=(notes, store.reader_generation), daemon=True)
+        self.thread.start()
+    def run(self, notes, generation):
+        start = time.perf_counter()
+        try:
+            moved = blob_store.migrate(notes)
+            referenced = list(referenced_images(notes, moved))
+            if store.reader_generation != generation:
+                return
+            removed, freed = blob_store.collect(referenced)
+        except Exception:
+            return
+        metrics.record("blobs.maintenance", time.perf_counter() - start, moved=len(moved), removed=removed, freed=freed)
+        self.finished.emit(moved, removed, freed)
+    def apply(self, moved, removed, freed):
+        notes = []
+        for nid, (old, new) in moved.items():
+            note = self.repo.get(nid)
+            if note is not None and list(note.get("images") or []) == old:
+                notes.append(dict(note, images=new))
+        try:
+            self.repo.save_notes(notes)
+        except Exception:
+            pass
+
+class DraftAutosave(QObject):
+    def __init__(self, key, fields, edits, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.fields = fields
+        self.baseline = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DRAFT_DELAY)
+        self.timer.timeout.connect(self.save)
+        for edit in edits:
+            edit.textChanged.connect(self.schedule)
+        autosaves.add(self)
+    def schedule(self, *args):
+        self.timer.start()
+    def cancel(self):
+        self.timer.stop()
+    def save(self):
+        self.timer.stop()
+        if self.key is not None:
+            draft_store.save(self.key, self.fields(), self.baseline)
+    def flush(self):
+        if self.timer.isActive():
+            self.save()
+    def rebind(self, key, baseline=None):
+        self.flush()
+        self.key = key
+        self.baseline = baseline
+    def restore(self):
+        return draft_store.load(self.key) if self.key is not None else None
+    def discard(self):
+        self.timer.stop()
+        if self.key is not None:
+            draft_store.discard(self.key)
+
+autosaves = weakref.WeakSet()
+
+def flush_drafts():
+    for autosave in list(autosaves):
+        if not sip.isdeleted(autosave):
+            autosave.flush()
+    draft_store.flush()
+
+upload_executor = None
+outbox_sync = None
+store_watcher = None
+blob_maintenance = None
+
+def get_upload_executor():
+    global upload_executor
+    if upload_executor is None:
+        upload_executor = UploadExecutor()
+    return upload_executor
+
+def get_outbox_sync():
+    global outbox_sync
+    if outbox_sync is None:
+        outbox_sync = OutboxSync(get_upload_executor())
+    return outbox_sync
+
+def get_store_watcher():
+    global store_watcher
+    if store_watcher is None:
+        store_watcher = StoreWatcher(store)
+    return store_watcher
+
+def get_blob_maintenance():
+    global blob_maintenance
+    if blob_maintenance is None:
+        blob_maintenance = BlobMaintenance()
+    return blob_maintenance